@@ -0,0 +1,247 @@
+"""
+Mide la capa Database sin Tk sobre catálogos sintéticos de distintos
+tamaños y guarda los tiempos en JSON para comparar entre versiones:
+
+    python benchmarks/bench_database.py --output antes.json
+    python benchmarks/bench_database.py --output despues.json --compare antes.json
+
+Por omisión usa 1k, 100k y 1M productos (se cambia con --sizes). Los datos
+se generan una vez por tamaño; con --data-dir se conservan entre corridas.
+Cada corrida trabaja sobre una copia, así las altas y ediciones no se
+acumulan.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, product_cursor  # noqa: E402
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+WAREHOUSES = 20
+DEPARTMENTS = ("computación", "papelería", "limpieza", "ferretería", "materiales", "impresion3D")
+# al comparar, una mediana más lenta que la anterior por este factor se marca
+REGRESSION_RATIO = 1.2
+
+
+# ------------------------------------------------------------------
+#  DATOS SINTÉTICOS
+# ------------------------------------------------------------------
+
+def generate(path, rows):
+    """
+    Crea una base migrada con WAREHOUSES almacenes y rows productos. Los
+    productos se insertan con una sola consulta recursiva (los triggers de
+    texto, historial y resumen corren igual que en uso normal) y el saldo
+    inicial de cada producto se copia a existencias.
+    """
+    db = Database(path)
+    db.bulk_upsert_warehouses(
+        ({"id": i, "nombre": f"Almacén {i}"} for i in range(1, WAREHOUSES + 1)), "BENCH"
+    )
+    c = db.conn.cursor()
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    departments = ", ".join(f"('{d}')" for d in DEPARTMENTS)
+    c.execute(
+        f"""
+        WITH RECURSIVE
+            n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?),
+            d(nombre, k) AS (
+                SELECT column1, ROW_NUMBER() OVER () - 1 FROM (VALUES {departments})
+            )
+        INSERT INTO productos
+        (id, nombre, departamento, precio, cantidad, almacen,
+         fecha_hora_creacion, fecha_hora_ultima_modificacion, ultimo_usuario_en_modificar)
+        SELECT i, 'Producto ' || i || ' modelo ' || (i * 7919 % 100000),
+               d.nombre, (i * 37 % 100000) / 100.0, i * 13 % 500,
+               i % {WAREHOUSES} + 1, ?, ?, 'BENCH'
+        FROM n JOIN d ON d.k = i % {len(DEPARTMENTS)}
+        """,
+        (rows, now, now),
+    )
+    c.execute(
+        "INSERT INTO existencias (producto, almacen, cantidad) "
+        "SELECT id, almacen, cantidad FROM productos WHERE cantidad != 0"
+    )
+    db.conn.commit()
+    db.close()
+
+
+def dataset(data_dir, rows):
+    path = os.path.join(data_dir, f"sintetico_{rows}.db")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        generate(path, rows)
+        print(f"  datos de {rows} filas generados en {time.perf_counter() - start:.1f} s")
+    return path
+
+
+def copy_database(source, target):
+    # la fuente se cerró limpia: su WAL ya se vació al archivo principal
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    shutil.copy(source, target)
+
+
+# ------------------------------------------------------------------
+#  MEDICIONES
+# ------------------------------------------------------------------
+
+def measure(fn, repeat, ops=1):
+    """Corre fn repeat veces; regresa ms por operación (fn hace ops)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000 / ops)
+    return {
+        "median_ms": round(statistics.median(times), 4),
+        "min_ms": round(min(times), 4),
+        "max_ms": round(max(times), 4),
+        "runs": repeat,
+    }
+
+
+def run_size(path, rows, repeat):
+    results = {}
+    rng = random.Random(rows)
+    ids = [rng.randint(1, rows) for _ in range(200)]
+
+    def startup():
+        Database(path).close()
+
+    # abrir la base: conexiones, PRAGMAs, migraciones ya al día, usuarios
+    results["startup"] = measure(startup, repeat)
+
+    db = Database(path)
+    try:
+        # listar todo solo tiene sentido en tamaños que la interfaz carga completos
+        list_repeat = repeat if rows <= 100_000 else 1
+        results["list_products"] = measure(db.list_products, list_repeat)
+        results["first_page"] = measure(lambda: db.search_products(limit=100), repeat)
+
+        page = db.search_products(limit=100, order_by="name")
+        cursor = product_cursor(page[-1], "name") if page else None
+        results["page_by_name"] = measure(
+            lambda: db.search_products(limit=100, order_by="name", after=cursor), repeat
+        )
+        for name, filters in (
+                ("search_text", {"text": "modelo 4242"}),
+                ("search_prefix", {"text": "Pr"}),
+                ("search_name", {"name": "Producto 99"}),
+                ("search_ranges", {"price_min": 100, "price_max": 200, "stock_max": 10}),
+                ("search_warehouse", {"warehouse": "Almacén 7"}),
+        ):
+            results[name] = measure(
+                lambda f=filters: db.search_products(f, limit=100), repeat
+            )
+
+        def audit():
+            for product_id in ids:
+                db.get_product_audit(product_id)
+
+        def history():
+            for product_id in ids:
+                db.get_product_history(product_id, 20)
+
+        results["get_product_audit"] = measure(audit, repeat, len(ids))
+        results["get_product_history"] = measure(history, repeat, len(ids))
+        results["get_dashboard"] = measure(db.get_dashboard, repeat)
+
+        def add():
+            for i in range(len(ids)):
+                db.add_product(f"Nuevo {i}", "bench", 10.0, 5, i % WAREHOUSES + 1, "BENCH")
+
+        def update():
+            for product_id in ids:
+                p = db.get_product(product_id)
+                db.update_product(
+                    product_id, p.name, p.description, p.price + 1, p.stock + 1,
+                    db.warehouse_catalog().name_to_id[p.warehouse_name], "BENCH",
+                )
+
+        results["add_product"] = measure(add, repeat, len(ids))
+        results["update_product"] = measure(update, repeat, len(ids))
+    finally:
+        db.close()
+    return results
+
+
+# ------------------------------------------------------------------
+#  REPORTE
+# ------------------------------------------------------------------
+
+def compare(current, previous):
+    print("\nComparación contra la corrida anterior (mediana, ms por operación):")
+    for size, results in current["results"].items():
+        before = previous.get("results", {}).get(size)
+        if not before:
+            continue
+        print(f"  {size} filas")
+        for name, stats in results.items():
+            if name not in before:
+                continue
+            old, new = before[name]["median_ms"], stats["median_ms"]
+            ratio = new / old if old else float("inf")
+            flag = "  <-- REGRESIÓN" if ratio > REGRESSION_RATIO else ""
+            print(f"    {name:22s} {old:10.3f} -> {new:10.3f}  x{ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+        help="tamaños separados por coma (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="repeticiones por medición")
+    parser.add_argument("--data-dir", help="carpeta donde generar y reutilizar los datos")
+    parser.add_argument("--output", default="benchmark.json", help="archivo JSON de salida")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for rows in sizes:
+            print(f"{rows} filas")
+            work = os.path.join(tmp, "trabajo.db")
+            copy_database(dataset(data_dir, rows), work)
+            results = run_size(work, rows, args.repeat)
+            report["results"][str(rows)] = results
+            for name, stats in results.items():
+                print(f"  {name:22s} {stats['median_ms']:10.3f} ms")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Mide cuánto cuesta el historial (triggers *_historial_*) en una carga
+masiva que actualiza todos los productos: la misma carga con y sin los
+triggers, sobre dos copias de la misma base.
+
+    python benchmarks/bench_history.py [filas]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+
+def seed(path, rows):
+    db = Database(path)
+    db.bulk_upsert_warehouses(
+        ({"id": i, "nombre": f"Almacén {i}"} for i in range(1, 11)), "BENCH"
+    )
+    db.bulk_upsert_products(
+        (
+            {
+                "id": i,
+                "nombre": f"Producto {i}",
+                "departamento": f"Depto {i % 50}",
+                "precio": i % 1000,
+                "cantidad": i % 300,
+                "almacen": i % 10 + 1,
+            }
+            for i in range(1, rows + 1)
+        ),
+        "BENCH",
+    )
+    db.close()
+
+
+def drop_history_triggers(path):
+    db = Database(path)
+    c = db.conn.cursor()
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_historial_%'")
+    for (name,) in c.fetchall():
+        c.execute(f"DROP TRIGGER {name}")
+    db.conn.commit()
+    db.close()
+
+
+def bulk_update(path, rows):
+    db = Database(path)
+    start = time.perf_counter()
+    db.bulk_upsert_products(
+        (
+            {
+                "id": i,
+                "nombre": f"Producto {i}",
+                "departamento": f"Depto {i % 50}",
+                "precio": i % 1000 + 1,
+                "cantidad": i % 300,
+                "almacen": i % 10 + 1,
+            }
+            for i in range(1, rows + 1)
+        ),
+        "BENCH",
+    )
+    elapsed = time.perf_counter() - start
+    c = db.conn.cursor()
+    c.execute("SELECT COUNT(*) FROM historial")
+    history_rows = c.fetchone()[0]
+    db.close()
+    return elapsed, history_rows
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base.db")
+        seed(base, rows)
+
+        with_history = os.path.join(tmp, "con_historial.db")
+        without_history = os.path.join(tmp, "sin_historial.db")
+        shutil.copy(base, with_history)
+        shutil.copy(base, without_history)
+        drop_history_triggers(without_history)
+
+        results = {}
+        for name, path in (("sin historial", without_history), ("con historial", with_history)):
+            elapsed, history_rows = bulk_update(path, rows)
+            results[name] = elapsed
+            print(
+                f"{name:14s} {rows} filas: {elapsed * 1000:8.1f} ms "
+                f"({elapsed / rows * 1e6:5.1f} µs/fila), historial: {history_rows} filas"
+            )
+
+        overhead = results["con historial"] / results["sin historial"] - 1
+        print(f"costo del historial: {overhead * 100:+.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compara el costo de convertir filas de productos en objetos: la forma
+anterior (sqlite3.Row + r.keys() por fila + dataclass con __dict__) contra
+la actual (columnas por posición + Product con slots).
+
+    python benchmarks/bench_rows.py [filas]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+
+@dataclass
+class LegacyProduct:
+    id: int
+    name: str
+    description: str
+    price: float
+    stock: int
+    last_modified: Optional[str]
+    warehouse_name: Optional[str] = None
+
+
+def legacy_load(conn):
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT p.*, a.nombre AS almacen_nombre
+        FROM productos p LEFT JOIN almacenes a ON p.almacen = a.id
+        ORDER BY p.id
+        """
+    )
+    products = []
+    for r in c.fetchall():
+        last_modified = None
+        if "fecha_hora_ultima_modificacion" in r.keys():
+            last_modified = r["fecha_hora_ultima_modificacion"]
+        warehouse_name = None
+        if "almacen_nombre" in r.keys():
+            warehouse_name = r["almacen_nombre"]
+        products.append(
+            LegacyProduct(
+                id=r["id"],
+                name=r["nombre"],
+                description=r["departamento"],
+                price=r["precio"],
+                stock=r["cantidad"],
+                last_modified=last_modified,
+                warehouse_name=warehouse_name,
+            )
+        )
+    return products
+
+
+def current_load(db):
+    return db.list_products()
+
+
+def measure(load, source):
+    # el tiempo se mide sin tracemalloc, que vuelve lenta cada asignación
+    start = time.perf_counter()
+    products = load(source)
+    elapsed = time.perf_counter() - start
+    count = len(products)
+    del products
+
+    tracemalloc.start()
+    load(source)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = Database(path)
+        db.bulk_upsert_warehouses(
+            ({"id": i, "nombre": f"Almacén {i}"} for i in range(1, 11)), "BENCH"
+        )
+        db.bulk_upsert_products(
+            (
+                {
+                    "nombre": f"Producto {i}",
+                    "departamento": f"Depto {i % 50}",
+                    "precio": i % 1000,
+                    "cantidad": i % 300,
+                    "almacen": i % 10 + 1,
+                }
+                for i in range(rows)
+            ),
+            "BENCH",
+        )
+
+        conn = sqlite3.connect(path)
+        for name, load, source in (
+                ("anterior", legacy_load, conn),
+                ("actual", current_load, db),
+        ):
+            # una pasada de calentamiento para que la página ya esté en caché
+            load(source)
+            count, elapsed, peak = measure(load, source)
+            per_100k = 100_000 / count
+            print(
+                f"{name:9s} {count} filas: {elapsed * per_100k * 1000:8.1f} ms / 100k, "
+                f"pico {peak * per_100k / 1024 / 1024:6.1f} MiB / 100k"
+            )
+        conn.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Mide el arranque de la aplicación en un proceso nuevo (como al abrir el
+ejecutable): desde que se lanza hasta que la ventana de login está lista,
+y desde el login hasta que la ventana principal está lista. Necesita
+pantalla (DISPLAY en Linux). Se usa una copia de la base indicada.
+
+    python benchmarks/bench_startup.py [repeticiones] [base.db]
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(db_path):
+    """Corre dentro del proceso medido; imprime los tiempos como JSON."""
+    marks = {}
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)  # logo.png se busca en la carpeta del proyecto
+
+    from database import Database
+    from models import User
+    from ui import LoginWindow, MainWindow
+    marks["imports"] = time.time()
+
+    db = Database(db_path)
+    login = LoginWindow(db)
+    login.update()
+    marks["login"] = time.time()
+
+    # lo mismo que LoginWindow._on_login después de autenticar
+    start = time.time()
+    login.destroy()
+    main = MainWindow(db, User(0, "BENCH", "ADMIN", None))
+    main.update()
+    marks["main"] = time.time() - start
+
+    main.worker.stop()
+    main.destroy()
+    db.close()
+    print(json.dumps(marks))
+
+
+def run_once(db_path):
+    start = time.time()
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", db_path],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        # típicamente no hay pantalla: se muestra el error del proceso medido
+        sys.exit(f"El proceso medido falló:\n{proc.stderr.strip()}")
+    marks = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {
+        "imports": marks["imports"] - start,
+        "login": marks["login"] - start,
+        "main": marks["main"],
+    }
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    source = sys.argv[2] if len(sys.argv) > 2 else os.path.join(ROOT, "InventarioBD_2.db")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        shutil.copy(source, db_path)
+
+        results = [run_once(db_path) for _ in range(runs)]
+
+    for key, label in (
+            ("imports", "lanzamiento -> módulos cargados"),
+            ("login", "lanzamiento -> login listo"),
+            ("main", "login -> ventana principal"),
+    ):
+        values = [r[key] * 1000 for r in results]
+        print(
+            f"{label:34s} mediana {statistics.median(values):7.1f} ms  "
+            f"(mín {min(values):7.1f}, máx {max(values):7.1f})"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        child(sys.argv[2])
+    else:
+        main()
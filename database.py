@@ -1,40 +1,627 @@
 import sqlite3
 import hashlib
 import datetime
-from typing import List, Optional
+import functools
+import inspect
+import json
+import math
+import pathlib
+import queue
+import string
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
 
-from models import User, Product, Warehouse
+import migrations
+from instrumentation import QueryStats, instrumented
+from models import (
+    ChangeEvent,
+    Dashboard,
+    HistoryEntry,
+    ImportResult,
+    User,
+    Product,
+    StockMovement,
+    Warehouse,
+    WarehouseCatalog,
+    WarehouseSummary,
+)
 
 DB_NAME = "InventarioBD_2.db"
 
+# Columnas en el mismo orden que los campos de Product / Warehouse, para
+# construir cada objeto por posición sin buscar llaves fila por fila. El
+# nombre del almacén no se lee con JOIN: sale del catálogo en memoria.
+PRODUCT_COLUMNS = """
+    p.id,
+    p.nombre,
+    p.departamento,
+    p.precio,
+    p.cantidad,
+    p.fecha_hora_ultima_modificacion,
+    p.almacen
+"""
+WAREHOUSE_COLUMNS = "id, nombre, fecha_hora_ultima_modificacion"
+
+
+# Orden que se puede pedir a search_products / search_warehouses:
+# llave -> (expresión del ORDER BY, atributo del objeto). El desempate
+# siempre es por id, así (valor, id) sirve de cursor para paginar.
+PRODUCT_SORTS = {
+    "id": ("p.id", None),
+    "name": ("p.nombre COLLATE NOCASE", "name"),
+    "desc": ("p.departamento COLLATE NOCASE", "description"),
+    "price": ("p.precio", "price"),
+    "stock": ("p.cantidad", "stock"),
+}
+WAREHOUSE_SORTS = {
+    "id": None,
+    "name": "name",
+}
+
+# valores de DatabaseConfig.warehouse_delete_policy
+WAREHOUSE_DELETE_POLICIES = ("restrict", "reassign")
+
+# NOCASE de SQLite solo pasa a minúsculas las letras ASCII
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _py_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _sort_cursor(obj, attribute: Optional[str]) -> tuple:
+    if attribute is None:
+        return (obj.id,)
+    value = getattr(obj, attribute)
+    if isinstance(value, str):
+        value = value.translate(_ASCII_LOWER)
+    return (value, obj.id)
+
+
+def product_cursor(product: Product, order_by: str = "id") -> tuple:
+    """
+    Cursor de paginación de un producto para el orden order_by: (id,)
+    para "id" y (valor, id) para las demás columnas, comparable igual que
+    en el ORDER BY de SQL.
+    """
+    return _sort_cursor(product, PRODUCT_SORTS[order_by][1])
+
+
+def warehouse_cursor(warehouse: Warehouse, order_by: str = "id") -> tuple:
+    return _sort_cursor(warehouse, WAREHOUSE_SORTS[order_by])
+
+
+def _warehouse_row(cursor, row) -> Warehouse:
+    return Warehouse(*row)
+
+
+@dataclass
+class DatabaseConfig:
+    """
+    PRAGMAs que se aplican a cada conexión. WAL deja leer mientras se
+    escribe y con synchronous=NORMAL cada commit ya no hace varios fsync;
+    si la base vive en una carpeta de red que no soporta WAL se puede
+    regresar a journal_mode="DELETE".
+    """
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size_kib: int = 16384
+    mmap_size: int = 128 * 1024 * 1024
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 5000
+    read_pool_size: int = 4
+    read_pool_timeout_s: float = 10.0
+    product_cache_size: int = 512
+    # cada cuántas instrucciones de SQLite se revisa si la consulta se canceló
+    cancel_check_ops: int = 1000
+    # al abrir la base se toma un corte de existencias si el último es más viejo
+    stock_snapshot_days: float = 1.0
+    # estadísticas por operación y bitácora de consultas lentas; apagado por
+    # omisión porque el trace callback corre por cada sentencia (y trigger)
+    instrument: bool = False
+    slow_query_ms: float = 200.0
+    slow_query_log: Optional[str] = "consultas_lentas.log"
+    # al eliminar un almacén que todavía tiene productos o existencias:
+    # "restrict" no lo deja eliminar; "reassign" los pasa, con su saldo, a
+    # default_warehouse_id
+    warehouse_delete_policy: str = "restrict"
+    default_warehouse_id: Optional[int] = None
+
+
+class LRUCache:
+    """
+    Caché LRU pequeña y segura entre hilos. put() recibe la generación que
+    se leyó antes de consultar la base; si entre tanto hubo una invalidación
+    el valor (posiblemente viejo) se descarta.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, generation: int) -> None:
+        with self._lock:
+            if generation != self.generation or self.capacity <= 0:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class ConnectionPool:
+    """
+    Conjunto de conexiones de solo lectura. Las conexiones se crean bajo
+    demanda hasta size y se piden con el context manager connection(); si
+    todas están ocupadas se espera hasta timeout segundos.
+    """
+
+    def __init__(self, factory: Callable[[], sqlite3.Connection], size: int, timeout: float):
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                self._in_use -= 1
+                # bajo el candado: close() ya no alcanza a verla en _idle
+                closed = self._closed
+                if not closed:
+                    self._idle.put(conn)
+            if closed:
+                # estaba prestada cuando se cerró el pool
+                conn.close()
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("El pool de conexiones ya se cerró")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._create_or_wait()
+
+        with self._lock:
+            self._in_use += 1
+            self.checkouts += 1
+        return conn
+
+    def _create_or_wait(self) -> sqlite3.Connection:
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise sqlite3.OperationalError(
+                f"No hay conexiones de lectura libres después de {self.timeout} s"
+            )
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.waits += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return conn
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+    def close(self) -> None:
+        """
+        Cierra las conexiones libres; las que estén prestadas se cierran
+        en cuanto se regresan.
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def synchronized(method):
+    """
+    Serializa el acceso a la conexión: la UI y el hilo de DatabaseWorker
+    comparten la misma instancia de Database. Si una escritura suelta
+    (fuera de transaction()) falla, se revierte aquí; si no, la transacción
+    implícita quedaría abierta y bloquearía a los demás escritores.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            try:
+                return method(self, *args, **kwargs)
+            except BaseException:
+                if self._tx_depth == 0 and self.conn.in_transaction:
+                    self.conn.rollback()
+                raise
+    return wrapper
+
 
 class Database:
-    def __init__(self, db_name: str = DB_NAME):
-        self.conn = sqlite3.connect(db_name)
-        self.conn.row_factory = sqlite3.Row
+    def __init__(self, db_name: str = DB_NAME, config: Optional[DatabaseConfig] = None):
+        self.db_name = db_name
+        self.config = config or DatabaseConfig()
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[ChangeEvent], None]] = []
+        # Solo ve las escrituras de este proceso, igual que el change feed.
+        self._product_cache = LRUCache(self.config.product_cache_size)
+        self._warehouse_catalog: Optional[WarehouseCatalog] = None
+        self._catalog_lock = threading.Lock()
+        self._catalog_generation = 0
+        self.warehouse_cache_hits = 0
+        self.warehouse_cache_misses = 0
+        self._cancel = threading.local()
+        # unidad de trabajo: profundidad de transaction(), hilo dueño y
+        # avisos que esperan al commit exterior
+        self._tx_depth = 0
+        self._tx_owner: Optional[int] = None
+        self._pending_events: list = []
+        self.query_stats: Optional[QueryStats] = None
+        if self.config.instrument:
+            self.query_stats = QueryStats(
+                self.config.slow_query_ms, self.config.slow_query_log, self._explain
+            )
+        self.conn = self._connect()
+        self.conn.execute(f"PRAGMA journal_mode = {self.config.journal_mode}")
+
+        # Una sola conexión escribe (self.conn); las consultas usan el pool.
+        # Una base en memoria no se puede abrir dos veces, ahí todo va por self.conn.
+        self._readers: Optional[ConnectionPool] = None
+        if db_name != ":memory:":
+            self._readers = ConnectionPool(
+                lambda: self._connect(readonly=True),
+                self.config.read_pool_size,
+                self.config.read_pool_timeout_s,
+            )
 
-        self._create_user_table()
+        migrations.migrate(self.conn)
         self._ensure_default_users()
-        self._ensure_audit_columns()
+        self.has_fts = self._table_exists("productos_fts")
+        self._take_due_stock_snapshot()
 
     # ------------------------------------------------------------------
-    #  USUARIOS
+    #  CONEXIONES
     # ------------------------------------------------------------------
 
-    def _create_user_table(self) -> None:
-        c = self.conn.cursor()
-        c.execute(
-            """
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                fecha_hora_ultimo_inicio TEXT,
-                rol TEXT NOT NULL
-            )
-            """
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        """
+        Abre una conexión con los PRAGMAs de self.config. Las de solo lectura
+        se abren con un URI mode=ro.
+        """
+        cfg = self.config
+        if readonly:
+            target = pathlib.Path(self.db_name).resolve().as_uri() + "?mode=ro"
+        else:
+            target = self.db_name
+        conn = sqlite3.connect(
+            target,
+            timeout=cfg.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            uri=readonly,
         )
-        self.conn.commit()
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(cfg.busy_timeout_ms)}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        # LIKE de SQLite solo ignora mayúsculas en ASCII (ver _like_clause)
+        conn.create_function("py_lower", 1, _py_lower, deterministic=True)
+        if not readonly:
+            conn.execute(f"PRAGMA synchronous = {cfg.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {-int(cfg.cache_size_kib)}")
+        conn.execute(f"PRAGMA mmap_size = {int(cfg.mmap_size)}")
+        conn.execute(f"PRAGMA temp_store = {cfg.temp_store}")
+        if readonly:
+            conn.set_progress_handler(self._check_cancelled, cfg.cancel_check_ops)
+        if self.query_stats is not None:
+            conn.set_trace_callback(self.query_stats.on_statement)
+        return conn
+
+    @contextmanager
+    def cancellable(self, event: threading.Event):
+        """
+        Las lecturas que haga este hilo dentro del bloque se interrumpen
+        (sqlite3.OperationalError) en cuanto event se activa. Las escrituras
+        nunca se cortan a la mitad.
+        """
+        previous = getattr(self._cancel, "event", None)
+        self._cancel.event = event
+        try:
+            yield
+        finally:
+            self._cancel.event = previous
+
+    def _check_cancelled(self) -> int:
+        event = getattr(self._cancel, "event", None)
+        return 1 if event is not None and event.is_set() else 0
+
+    def _table_exists(self, name: str) -> bool:
+        c = self.conn.cursor()
+        c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+        return c.fetchone() is not None
+
+    @contextmanager
+    def _reader(self):
+        """
+        Presta una conexión de lectura del pool. Dentro de transaction(), el
+        hilo dueño lee de self.conn para ver sus propios cambios.
+        """
+        if self._in_transaction():
+            yield self.conn
+        elif self._readers is None:
+            with self._lock:
+                yield self.conn
+        else:
+            with self._readers.connection() as conn:
+                yield conn
+
+    @contextmanager
+    def _read_transaction(self):
+        """
+        Como _reader(), pero todas las consultas del bloque ven la misma
+        versión de la base (BEGIN ... COMMIT en la misma conexión): un
+        commit de otro hilo entre una y otra no se cuenta a medias.
+        """
+        with self._reader() as conn:
+            if conn.in_transaction:
+                # self.conn dentro de transaction(): ya es una sola vista
+                yield conn
+                return
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.commit()
+
+    def _explain(self, sql: str) -> list:
+        with self._reader() as conn:
+            return conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+
+    def get_query_stats(self) -> list[dict]:
+        """
+        Llamadas, latencias (p50/p95/p99), filas y commits por método, o
+        lista vacía si config.instrument está apagado.
+        """
+        if self.query_stats is None:
+            return []
+        return self.query_stats.snapshot()
+
+    def reset_query_stats(self) -> None:
+        if self.query_stats is not None:
+            self.query_stats.reset()
+
+    def pool_stats(self) -> dict:
+        """
+        Tamaño y uso del pool de lectura (checkouts, esperas, timeouts).
+        """
+        if self._readers is None:
+            return {}
+        return self._readers.stats()
+
+    # ------------------------------------------------------------------
+    #  TRANSACCIONES
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unidad de trabajo: las escrituras dentro del bloque se confirman
+        juntas al salir (un solo commit) o se revierten todas si hay una
+        excepción. Se puede anidar; los bloques internos usan SAVEPOINT y
+        solo revierten lo suyo. Mientras dura, los demás hilos esperan para
+        escribir, y los avisos de cambios e invalidaciones de caché se
+        entregan hasta el commit exterior.
+
+            with db.transaction():
+                db.add_warehouse(...)
+                db.bulk_move_warehouse(ids, ...)
+        """
+        with self._lock:
+            depth = self._tx_depth
+            mark = len(self._pending_events)
+            c = self.conn.cursor()
+            if depth == 0:
+                if self.conn.in_transaction:
+                    # algo quedó sin confirmar fuera de un bloque; no se mezcla
+                    self.conn.rollback()
+                c.execute("BEGIN")
+                self._tx_owner = threading.get_ident()
+            else:
+                c.execute(f"SAVEPOINT tx_{depth}")
+            self._tx_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._tx_depth -= 1
+                if depth == 0:
+                    self._end_transaction(commit=False)
+                else:
+                    c.execute(f"ROLLBACK TO tx_{depth}")
+                    c.execute(f"RELEASE tx_{depth}")
+                    del self._pending_events[mark:]
+                raise
+            self._tx_depth -= 1
+            if depth == 0:
+                self._end_transaction(commit=True)
+            else:
+                c.execute(f"RELEASE tx_{depth}")
+
+    def _end_transaction(self, commit: bool) -> None:
+        events, self._pending_events = self._pending_events, []
+        self._tx_owner = None
+        if not commit:
+            self.conn.rollback()
+            return
+        stats = self.query_stats
+        try:
+            if stats is None or stats.running():
+                # el COMMIT cuenta para la operación que abrió el bloque
+                self.conn.commit()
+            else:
+                # bloque abierto desde fuera: el commit se mide como su
+                # propia operación para que no se pierda en las estadísticas
+                stats.call("transaction", self.conn.commit, (), {})
+        except Exception:
+            self.conn.rollback()
+            raise
+        for event in self._coalesce_events(events):
+            self._notify(*event)
+
+    @staticmethod
+    def _coalesce_events(events: list) -> list:
+        """
+        Junta los avisos de una transacción: por tabla, uno solo queda
+        igual; varias ediciones o bajas de productos se vuelven un aviso con
+        todos los ids (la vista vuelve a leer esas filas) y lo demás (altas,
+        almacenes, cargas masivas) un aviso "bulk".
+        """
+        coalesced = []
+        for table in dict.fromkeys(event[0] for event in events):
+            same = [event for event in events if event[0] == table]
+            if len(same) == 1:
+                coalesced.append(same[0])
+                continue
+            if table == "productos" and all(event[1] in ("update", "delete") for event in same):
+                ids = []
+                for _, _, row_id, row_ids in same:
+                    ids.extend(row_ids or (row_id,))
+                coalesced.append((table, "update", None, tuple(dict.fromkeys(ids))))
+            else:
+                coalesced.append((table, "bulk", None, ()))
+        return coalesced
+
+    def _in_transaction(self) -> bool:
+        return self._tx_depth > 0 and self._tx_owner == threading.get_ident()
+
+    def _commit(self) -> None:
+        """Commit de un método suelto; dentro de transaction() lo hace el bloque."""
+        if self._tx_depth == 0:
+            self.conn.commit()
+
+    # ------------------------------------------------------------------
+    #  AVISOS DE CAMBIOS
+    # ------------------------------------------------------------------
+
+    def subscribe(self, listener: Callable[[ChangeEvent], None]) -> Callable[[], None]:
+        """
+        Registra listener para recibir un ChangeEvent después de cada
+        escritura confirmada. Se llama en el hilo que hizo la escritura.
+        Regresa una función para cancelar la suscripción.
+        """
+        self._listeners.append(listener)
+
+        def unsubscribe():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def _notify(
+            self, table: str, op: str, row_id: Optional[int] = None, row_ids: tuple = ()
+    ) -> None:
+        if self._tx_depth > 0:
+            self._pending_events.append((table, op, row_id, tuple(row_ids)))
+            return
+        if table == "almacenes":
+            self._catalog_generation += 1
+            self._warehouse_catalog = None
+        if table == "productos" and row_id is not None:
+            self._product_cache.invalidate(row_id)
+        elif table == "productos" and 0 < len(row_ids) <= self.config.product_cache_size:
+            for product_id in row_ids:
+                self._product_cache.invalidate(product_id)
+        else:
+            # cargas masivas o cambios de almacén (el nombre va en el producto)
+            self._product_cache.clear()
+
+        event = ChangeEvent(table, op, row_id, row_ids)
+        for listener in list(self._listeners):
+            listener(event)
+
+    def close(self) -> None:
+        if self._readers is not None:
+            self._readers.close()
+        self.conn.close()
+
+    # ------------------------------------------------------------------
+    #  USUARIOS
+    # ------------------------------------------------------------------
 
     def _ensure_default_users(self) -> None:
         c = self.conn.cursor()
@@ -52,6 +639,7 @@ class Database:
         """
         return hashlib.md5(password.encode("utf-8")).hexdigest()
 
+    @synchronized
     def create_user(self, username: str, password: str, role: str) -> None:
         password_hash = self._hash_password(password)
         c = self.conn.cursor()
@@ -62,8 +650,9 @@ class Database:
             """,
             (username, password_hash, role),
         )
-        self.conn.commit()
+        self._commit()
 
+    @synchronized
     def authenticate_user(self, username: str, password: str) -> Optional[User]:
 
         c = self.conn.cursor()
@@ -89,7 +678,7 @@ class Database:
             "UPDATE usuarios SET fecha_hora_ultimo_inicio=? WHERE id=?",
             (now_str, row["id"]),
         )
-        self.conn.commit()
+        self._commit()
 
         return User(
             id=row["id"],
@@ -99,92 +688,319 @@ class Database:
         )
 
     # ------------------------------------------------------------------
-    #  COLUMNAS DE AUDITORÍA (PRODUCTOS Y ALMACENES)
+    #  BÚSQUEDA DE TEXTO (FTS5)
     # ------------------------------------------------------------------
 
-    def _ensure_audit_columns(self) -> None:
-        c = self.conn.cursor()
-
-        # ---------- PRODUCTOS ----------
-        c.execute("PRAGMA table_info(productos)")
-        cols_prod = [row[1].lower() for row in c.fetchall()]
-
-        if "fecha_hora_creacion" not in cols_prod:
-            c.execute("ALTER TABLE productos ADD COLUMN fecha_hora_creacion TEXT")
-        if "fecha_hora_ultima_modificacion" not in cols_prod:
-            c.execute("ALTER TABLE productos ADD COLUMN fecha_hora_ultima_modificacion TEXT")
-        if "ultimo_usuario_en_modificar" not in cols_prod:
-            c.execute("ALTER TABLE productos ADD COLUMN ultimo_usuario_en_modificar TEXT")
-
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        c.execute(
-            """
-            UPDATE productos
-            SET fecha_hora_creacion = COALESCE(fecha_hora_creacion, ?)
-            """,
-            (now,),
-        )
+    # Trigram permite búsquedas de subcadena, pero necesita al menos 3 letras.
+    FTS_MIN_LENGTH = 3
 
-        # ---------- ALMACENES ----------
-        c.execute("PRAGMA table_info(almacenes)")
-        cols_alm = [row[1].lower() for row in c.fetchall()]
+    @staticmethod
+    def _fts_phrase(text: str, column: Optional[str] = None) -> str:
+        """
+        Convierte el texto del usuario en una frase FTS5 literal, opcionalmente
+        limitada a una columna.
+        """
+        phrase = '"' + text.replace('"', '""') + '"'
+        if column:
+            return f"{column} : {phrase}"
+        return phrase
 
-        if "fecha_hora_creacion" not in cols_alm:
-            c.execute("ALTER TABLE almacenes ADD COLUMN fecha_hora_creacion TEXT")
-        if "fecha_hora_ultima_modificacion" not in cols_alm:
-            c.execute("ALTER TABLE almacenes ADD COLUMN fecha_hora_ultima_modificacion TEXT")
-        if "ultimo_usuario_en_modificar" not in cols_alm:
-            c.execute("ALTER TABLE almacenes ADD COLUMN ultimo_usuario_en_modificar TEXT")
+    def _use_fts(self, text: str) -> bool:
+        return self.has_fts and len(text) >= self.FTS_MIN_LENGTH
 
-        c.execute(
-            """
-            UPDATE almacenes
-            SET fecha_hora_creacion = COALESCE(fecha_hora_creacion, ?)
-            """,
-            (now,),
-        )
+    def search_products_text(self, query: str, limit: int = 50) -> list[Product]:
+        """
+        Busca el texto en nombre y departamento y regresa los productos
+        ordenados por relevancia (bm25). Con menos de 3 letras, o sin FTS5,
+        cae a una búsqueda LIKE por nombre.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        if not self._use_fts(query):
+            return self.search_products({"name": query}, limit=limit)
 
-        self.conn.commit()
+        row_factory = self._product_row_factory()
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.row_factory = row_factory
+            c.execute(
+                f"""
+                SELECT {PRODUCT_COLUMNS}
+                FROM productos_fts f
+                JOIN productos p ON p.id = f.rowid
+                WHERE productos_fts MATCH ?
+                ORDER BY f.rank
+                LIMIT ?
+                """,
+                (self._fts_phrase(query), limit),
+            )
+            return c.fetchall()
 
     # ------------------------------------------------------------------
     #  PRODUCTOS
     # ------------------------------------------------------------------
 
-    def list_products(self) -> list[Product]:
-        c = self.conn.cursor()
-        c.execute(
-            """
-            SELECT p.*,
-                   a.nombre AS almacen_nombre
-            FROM productos p
-            LEFT JOIN almacenes a ON p.almacen = a.id
-            ORDER BY p.id
-            """
-        )
-        rows = c.fetchall()
-
-        products: List[Product] = []
-        for r in rows:
-            last_modified = None
-            if "fecha_hora_ultima_modificacion" in r.keys():
-                last_modified = r["fecha_hora_ultima_modificacion"]
-
-            warehouse_name = None
-            if "almacen_nombre" in r.keys():
-                warehouse_name = r["almacen_nombre"]
-
-            products.append(
-                Product(
-                    id=r["id"],
-                    name=r["nombre"],
-                    description=r["departamento"],
-                    price=r["precio"],
-                    stock=r["cantidad"],
-                    last_modified=last_modified,
-                    warehouse_name=warehouse_name,   # 👈 aquí mandamos el nombre
+    # un solo parámetro con la lista en JSON, sin importar cuántos ids sean
+    _IDS_SQL = "SELECT value FROM json_each(?)"
+
+    @staticmethod
+    def _ids_param(ids) -> str:
+        return json.dumps([int(i) for i in ids])
+
+    @staticmethod
+    def _like_pattern(text: str, prefix: bool = False) -> str:
+        """
+        Patrón LIKE de "contiene" (o de "empieza con" si prefix), escapando
+        los comodines del usuario.
+        """
+        text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"{text}%" if prefix else f"%{text}%"
+
+    @classmethod
+    def _like_clause(cls, column: str, text: str, prefix: bool = False) -> Tuple[str, str]:
+        """
+        Condición LIKE sin distinguir mayúsculas. LIKE solo sabe hacerlo con
+        letras ASCII: si el texto trae ñ, acentos, etc. se comparan ambos
+        lados en minúsculas de Python (py_lower), como la búsqueda original,
+        aunque así no se usa el índice de la columna.
+        """
+        if text.isascii():
+            return f"{column} LIKE ? ESCAPE '\\'", cls._like_pattern(text, prefix)
+        return f"py_lower({column}) LIKE ? ESCAPE '\\'", cls._like_pattern(text.lower(), prefix)
+
+    @staticmethod
+    def _where(clauses: List[str]) -> str:
+        if not clauses:
+            return ""
+        return "WHERE " + " AND ".join(clauses)
+
+    @staticmethod
+    def _keyset_sql(
+            columns: List[str],
+            after: Optional[tuple],
+            before: Optional[tuple],
+            descending: bool,
+            clauses: List[str],
+            params: list,
+    ) -> str:
+        """
+        Agrega la condición de paginación por llave (keyset) sobre la tupla
+        de columnas y regresa la dirección del ORDER BY. after/before son
+        cursores con un valor por columna; con before se lee hacia atrás.
+        """
+        key = f"({', '.join(columns)})"
+        forward, backward = ("<", ">") if descending else (">", "<")
+        for cursor, op in ((after, forward), (before, backward)):
+            if cursor is None:
+                continue
+            if len(columns) > 1:
+                # con COLLATE la comparación de tuplas sola no acota el índice;
+                # el límite sobre la primera columna sí
+                clauses.append(f"{columns[0]} {op}= ?")
+                params.append(cursor[0])
+            clauses.append(f"{key} {op} ({', '.join('?' * len(cursor))})")
+            params.extend(cursor)
+        if before is not None:
+            return "ASC" if descending else "DESC"
+        return "DESC" if descending else "ASC"
+
+    def _product_filters_sql(
+            self, filters: Optional[dict], fts_join: bool = False
+    ) -> tuple[List[str], list]:
+        """
+        Convierte el diccionario de filtros de ProductSearchDialog en
+        condiciones SQL parametrizadas. Los valores vacíos o None se ignoran.
+        "text" es la búsqueda rápida en nombre y departamento; con fts_join
+        se filtra sobre productos_fts ya unida a la consulta.
+        """
+        clauses: List[str] = []
+        params: list = []
+        if not filters:
+            return clauses, params
+
+        if filters.get("id") not in (None, ""):
+            clauses.append("p.id = ?")
+            params.append(int(filters["id"]))
+        if filters.get("ids") is not None:
+            clauses.append(f"p.id IN ({self._IDS_SQL})")
+            params.append(self._ids_param(filters["ids"]))
+        text = filters.get("text")
+        if text:
+            if self._use_fts(text):
+                if fts_join:
+                    clauses.append("productos_fts MATCH ?")
+                else:
+                    clauses.append(
+                        "p.id IN (SELECT rowid FROM productos_fts WHERE productos_fts MATCH ?)"
+                    )
+                params.append(self._fts_phrase(text))
+            else:
+                # una o dos letras (o sin FTS5): "contiene" en nombre o
+                # departamento; con LIMIT la consulta corta en cuanto junta
+                # la página
+                name_clause, pattern = self._like_clause("p.nombre", text)
+                desc_clause, _ = self._like_clause("p.departamento", text)
+                clauses.append(f"({name_clause} OR {desc_clause})")
+                params.extend([pattern] * 2)
+        for key, column in (("name", "nombre"), ("desc", "departamento")):
+            text = filters.get(key)
+            if not text:
+                continue
+            if self._use_fts(text):
+                clauses.append(
+                    "p.id IN (SELECT rowid FROM productos_fts WHERE productos_fts MATCH ?)"
                 )
+                params.append(self._fts_phrase(text, column))
+            else:
+                clause, pattern = self._like_clause(f"p.{column}", text)
+                clauses.append(clause)
+                params.append(pattern)
+        if filters.get("warehouse"):
+            needle = filters["warehouse"].lower()
+            ids = [
+                w.id for w in self.warehouse_catalog().warehouses if needle in w.name.lower()
+            ]
+            if ids:
+                clauses.append(f"p.almacen IN ({', '.join('?' * len(ids))})")
+                params.extend(ids)
+            else:
+                clauses.append("0")
+        if filters.get("price_min") is not None:
+            clauses.append("p.precio >= ?")
+            params.append(filters["price_min"])
+        if filters.get("price_max") is not None:
+            clauses.append("p.precio <= ?")
+            params.append(filters["price_max"])
+        if filters.get("stock_min") is not None:
+            clauses.append("p.cantidad >= ?")
+            params.append(filters["stock_min"])
+        if filters.get("stock_max") is not None:
+            clauses.append("p.cantidad <= ?")
+            params.append(filters["stock_max"])
+
+        return clauses, params
+
+    def _product_row_factory(self):
+        """
+        row_factory para consultas con PRODUCT_COLUMNS (más columnas extra
+        opcionales al final); cambia el id de almacén por su nombre.
+        """
+        names = self.warehouse_catalog().id_to_name
+
+        def factory(cursor, row):
+            return Product(
+                row[0], row[1], row[2], row[3], row[4], row[5], names.get(row[6]), *row[7:]
             )
+
+        return factory
+
+    def list_products(self) -> list[Product]:
+        return self.search_products()
+
+    def _use_fts_join(self, filters: Optional[dict], order_by: str) -> bool:
+        """
+        La búsqueda rápida en orden de id se resuelve recorriendo
+        productos_fts por rowid: así LIMIT corta en cuanto junta la página
+        en lugar de reunir primero todas las coincidencias.
+        """
+        text = (filters or {}).get("text")
+        return bool(text) and order_by == "id" and self._use_fts(text)
+
+    def _products_select_sql(
+            self,
+            clauses: List[str],
+            direction: str = "ASC",
+            order_by: str = "id",
+            fts_join: bool = False,
+    ) -> str:
+        source = "productos p"
+        order = f"p.id {direction}"
+        if fts_join:
+            source = "productos_fts f JOIN productos p ON p.id = f.rowid"
+            order = f"f.rowid {direction}"
+        column = PRODUCT_SORTS[order_by][0]
+        if column != "p.id":
+            order = f"{column} {direction}, {order}"
+        return f"""
+            SELECT {PRODUCT_COLUMNS}
+            FROM {source}
+            {self._where(clauses)}
+            ORDER BY {order}
+        """
+
+    def iter_products(self, filters: Optional[dict] = None, batch_size: int = 1000):
+        """
+        Recorre el resultado de los filtros con fetchmany, de batch_size en
+        batch_size, sin cargar toda la tabla en memoria. La conexión de
+        lectura queda prestada hasta terminar (o cerrar) el generador.
+        """
+        clauses, params = self._product_filters_sql(filters)
+        row_factory = self._product_row_factory()
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.row_factory = row_factory
+            c.execute(self._products_select_sql(clauses), params)
+            while True:
+                rows = c.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def search_products(
+            self,
+            filters: Optional[dict] = None,
+            limit: Optional[int] = None,
+            offset: int = 0,
+            after_id: Optional[int] = None,
+            before_id: Optional[int] = None,
+            order_by: str = "id",
+            descending: bool = False,
+            after: Optional[tuple] = None,
+            before: Optional[tuple] = None,
+    ) -> list[Product]:
+        """
+        Busca productos aplicando los filtros directamente en SQL.
+
+        filters usa las mismas llaves que ProductSearchDialog (id, name, desc,
+        warehouse, price_min, price_max, stock_min, stock_max), con los
+        valores numéricos ya convertidos. order_by es una llave de
+        PRODUCT_SORTS. after/before son cursores de product_cursor() para
+        paginar por llave sin el costo de OFFSET (after_id/before_id son
+        atajos para el orden por id); el resultado siempre viene en el orden
+        pedido.
+        """
+        if after_id is not None:
+            after = (after_id,)
+        if before_id is not None:
+            before = (before_id,)
+
+        fts_join = self._use_fts_join(filters, order_by)
+        column = PRODUCT_SORTS[order_by][0]
+        if fts_join:
+            columns = ["f.rowid"]
+        elif column == "p.id":
+            columns = ["p.id"]
+        else:
+            columns = [column, "p.id"]
+        clauses, params = self._product_filters_sql(filters, fts_join)
+        direction = self._keyset_sql(columns, after, before, descending, clauses, params)
+        sql = self._products_select_sql(clauses, direction, order_by, fts_join)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+
+        row_factory = self._product_row_factory()
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.row_factory = row_factory
+            c.execute(sql, params)
+            products = c.fetchall()
+        if (direction == "DESC") != descending:
+            products.reverse()
         return products
+
+    @synchronized
     def add_product(
             self,
             name: str,
@@ -193,7 +1009,8 @@ class Database:
             stock: int,
             warehouse_id: int,
             username: str,
-    ) -> None:
+    ) -> int:
+        self._check_warehouse(warehouse_id)
         c = self.conn.cursor()
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -206,8 +1023,17 @@ class Database:
             """,
             (name, price, stock, description, warehouse_id, now, now, username),
         )
-        self.conn.commit()
+        product_id = c.lastrowid
+        if stock and warehouse_id is not None:
+            self._post_movements(
+                c, [(product_id, warehouse_id, "ENTRADA", int(stock), "alta del producto")],
+                username, now,
+            )
+        self._commit()
+        self._notify("productos", "insert", product_id)
+        return product_id
 
+    @synchronized
     def update_product(
             self,
             product_id: int,
@@ -218,8 +1044,10 @@ class Database:
             warehouse_id: int,
             username: str,
     ) -> None:
+        self._check_warehouse(warehouse_id)
         c = self.conn.cursor()
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        movements = self._edit_movements(c, product_id, int(stock), warehouse_id)
 
         c.execute(
             """
@@ -235,52 +1063,832 @@ class Database:
             """,
             (name, price, stock, description, warehouse_id, now, username, product_id),
         )
-        self.conn.commit()
+        updated = c.rowcount
+        self._post_movements(c, movements, username, now)
+        self._commit()
+        if updated:
+            self._notify("productos", "update", product_id)
 
-    def delete_product(self, product_id: int) -> None:
+    @synchronized
+    def delete_product(self, product_id: int, username: Optional[str] = None) -> None:
         c = self.conn.cursor()
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # el libro conserva la baja: el saldo que quedaba sale como ajuste
+        c.execute(
+            "SELECT almacen, cantidad FROM existencias WHERE producto = ? AND cantidad != 0",
+            (product_id,),
+        )
+        movements = [
+            (product_id, warehouse_id, "AJUSTE", -quantity, "baja del producto")
+            for warehouse_id, quantity in c.fetchall()
+        ]
+
+        if username is not None:
+            # deja en la fila quién la borra para que lo copie el historial
+            c.execute(
+                """
+                UPDATE productos
+                SET fecha_hora_ultima_modificacion = ?, ultimo_usuario_en_modificar = ?
+                WHERE id = ?
+                """,
+                (now, username, product_id),
+            )
         c.execute("DELETE FROM productos WHERE id = ?", (product_id,))
-        self.conn.commit()
+        deleted = c.rowcount
+        if deleted:
+            self._post_movements(c, movements, username, now)
+            c.execute("DELETE FROM existencias WHERE producto = ?", (product_id,))
+        self._commit()
+        if deleted:
+            self._notify("productos", "delete", product_id)
+
+    def get_product(self, product_id: int) -> Optional[Product]:
+        """
+        Un producto con nombre de almacén y campos de auditoría, buscado por
+        llave primaria y guardado en una caché LRU que se invalida con cada
+        escritura a ese id. Dentro de transaction() se lee directo (la caché
+        no debe guardar cambios que aún pueden revertirse).
+        """
+        in_transaction = self._in_transaction()
+        cached = None if in_transaction else self._product_cache.get(product_id)
+        if cached is not None:
+            return cached
+
+        generation = self._product_cache.generation
+        row_factory = self._product_row_factory()
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.row_factory = row_factory
+            c.execute(
+                f"""
+                SELECT {PRODUCT_COLUMNS},
+                       p.fecha_hora_creacion,
+                       p.ultimo_usuario_en_modificar
+                FROM productos p
+                WHERE p.id = ?
+                """,
+                (product_id,),
+            )
+            product = c.fetchone()
+
+        if product is not None and not in_transaction:
+            self._product_cache.put(product_id, product, generation)
+        return product
+
+    def product_cache_stats(self) -> dict:
+        return self._product_cache.stats()
 
     def get_product_audit(self, product_id: int):
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.execute(
+                """
+                SELECT fecha_hora_creacion,
+                       fecha_hora_ultima_modificacion,
+                       ultimo_usuario_en_modificar
+                FROM productos
+                WHERE id = ?
+                """,
+                (product_id,),
+            )
+            return c.fetchone()
+
+    # ------------------------------------------------------------------
+    #  HISTORIAL DE CAMBIOS
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _history_row(cursor, row) -> HistoryEntry:
+        before, after = row[6], row[7]
+        return HistoryEntry(
+            *row[:6],
+            json.loads(before) if before else None,
+            json.loads(after) if after else None,
+        )
+
+    def _history(self, table: str, row_id: int, limit: int, before: Optional[int]) -> list[HistoryEntry]:
+        clauses = ["tabla = ?", "fila = ?"]
+        params: list = [table, row_id]
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        params.append(limit)
+
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.row_factory = self._history_row
+            c.execute(
+                f"""
+                SELECT id, tabla, fila, operacion, fecha_hora, usuario, antes, despues
+                FROM historial
+                {self._where(clauses)}
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                params,
+            )
+            return c.fetchall()
+
+    def get_product_history(
+            self, product_id: int, limit: int = 50, before: Optional[int] = None
+    ) -> list[HistoryEntry]:
+        """
+        Cambios del producto, del más reciente al más viejo. Para la página
+        siguiente se pasa before = id de la última entrada recibida.
+        """
+        return self._history("productos", product_id, limit, before)
+
+    def get_warehouse_history(
+            self, warehouse_id: int, limit: int = 50, before: Optional[int] = None
+    ) -> list[HistoryEntry]:
+        return self._history("almacenes", warehouse_id, limit, before)
+
+    # ------------------------------------------------------------------
+    #  MOVIMIENTOS DE INVENTARIO
+    # ------------------------------------------------------------------
+    #
+    # Cada cambio de existencias queda en movimientos (una fila por almacén
+    # afectado, con la cantidad con signo) y en el mismo commit se suma al
+    # saldo de existencias (producto, almacén). productos.cantidad es el
+    # total del producto y productos.almacen el almacén principal, donde
+    # caen las entradas y los ajustes que no indican otro.
+
+    MOVEMENT_KINDS = ("ENTRADA", "SALIDA", "TRASPASO", "AJUSTE")
+
+    @staticmethod
+    def _post_movements(c: sqlite3.Cursor, movements: list, username: Optional[str], now: str) -> None:
+        """
+        Escribe movements [(producto, almacen, tipo, cantidad, nota)] en el
+        libro y los suma al saldo, sin hacer commit. Cada fila es un INSERT
+        y un upsert por llave primaria: el costo no depende del tamaño del libro.
+        """
+        if not movements:
+            return
+        c.executemany(
+            """
+            INSERT INTO movimientos
+            (producto, almacen, tipo, cantidad, usuario, fecha_hora, nota)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(p, w, kind, q, username, now, note) for p, w, kind, q, note in movements],
+        )
+        c.executemany(
+            """
+            INSERT INTO existencias (producto, almacen, cantidad) VALUES (?, ?, ?)
+            ON CONFLICT(producto, almacen) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+            """,
+            [(p, w, q) for p, w, kind, q, note in movements],
+        )
+
+    @staticmethod
+    def _post_movements_query(
+            c: sqlite3.Cursor, select_sql: str, params: tuple, username: Optional[str], now: str
+    ) -> None:
+        """
+        Igual que _post_movements, por conjuntos: select_sql regresa
+        (producto, almacen, tipo, cantidad, nota) y se evalúa una sola vez.
+        """
+        c.execute("DROP TABLE IF EXISTS temp.movimientos_nuevos")
+        c.execute("CREATE TEMP TABLE movimientos_nuevos (producto, almacen, tipo, cantidad, nota)")
+        c.execute(f"INSERT INTO temp.movimientos_nuevos {select_sql}", params)
+        c.execute(
+            """
+            INSERT INTO movimientos
+            (producto, almacen, tipo, cantidad, usuario, fecha_hora, nota)
+            SELECT producto, almacen, tipo, cantidad, ?, ?, nota
+            FROM temp.movimientos_nuevos WHERE cantidad != 0
+            """,
+            (username, now),
+        )
+        c.execute(
+            """
+            INSERT INTO existencias (producto, almacen, cantidad)
+            SELECT producto, almacen, cantidad FROM temp.movimientos_nuevos WHERE cantidad != 0
+            ON CONFLICT(producto, almacen) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+            """
+        )
+        c.execute("DROP TABLE temp.movimientos_nuevos")
+
+    @staticmethod
+    def _stock_balance(c: sqlite3.Cursor, product_id: int, warehouse_id: int) -> int:
+        c.execute(
+            "SELECT cantidad FROM existencias WHERE producto = ? AND almacen = ?",
+            (product_id, warehouse_id),
+        )
+        row = c.fetchone()
+        return row[0] if row else 0
+
+    def _edit_movements(self, c: sqlite3.Cursor, product_id: int, stock: int, warehouse_id) -> list:
+        """
+        Movimientos que equivalen a editar el producto: si cambió el almacén
+        principal su saldo se traspasa al nuevo, y la diferencia de cantidad
+        queda como ajuste en el almacén principal. Si al bajar la cantidad
+        no alcanza el saldo del principal, éste queda en cero y el resto se
+        descuenta de los demás almacenes, del de mayor saldo al de menor.
+        """
+        c.execute("SELECT cantidad, almacen FROM productos WHERE id = ?", (product_id,))
+        row = c.fetchone()
+        if row is None or warehouse_id is None:
+            return []
+        old_stock, old_warehouse = row
+        if stock < 0:
+            raise ValueError("La cantidad no puede ser negativa.")
+
+        movements = []
+        balance = self._stock_balance(c, product_id, warehouse_id)
+        moved_from = None
+        if old_warehouse is not None and old_warehouse != warehouse_id:
+            moved = self._stock_balance(c, product_id, old_warehouse)
+            if moved:
+                note = "cambio de almacén principal"
+                movements.append((product_id, old_warehouse, "TRASPASO", -moved, note))
+                movements.append((product_id, warehouse_id, "TRASPASO", moved, note))
+                balance += moved
+                moved_from = old_warehouse
+
+        delta = stock - old_stock
+        note = "edición del producto"
+        if delta >= 0 or balance + delta >= 0:
+            if delta:
+                movements.append((product_id, warehouse_id, "AJUSTE", delta, note))
+            return movements
+
+        if balance:
+            movements.append((product_id, warehouse_id, "AJUSTE", -balance, note))
+        shortfall = -(balance + delta)
+        c.execute(
+            """
+            SELECT almacen, cantidad FROM existencias
+            WHERE producto = ? AND almacen != ? AND almacen IS NOT ? AND cantidad > 0
+            ORDER BY cantidad DESC, almacen
+            """,
+            (product_id, warehouse_id, moved_from),
+        )
+        for other, quantity in c.fetchall():
+            taken = min(quantity, shortfall)
+            movements.append((product_id, other, "AJUSTE", -taken, note))
+            shortfall -= taken
+            if not shortfall:
+                return movements
+        raise ValueError("El saldo por almacén no cuadra con la cantidad del producto.")
+
+    @synchronized
+    def post_movement(
+            self,
+            product_id: int,
+            kind: str,
+            quantity: int,
+            username: str,
+            warehouse_id: Optional[int] = None,
+            to_warehouse_id: Optional[int] = None,
+            note: Optional[str] = None,
+    ) -> None:
+        """
+        Registra un movimiento y actualiza saldo y total del producto en la
+        misma transacción. quantity es positiva para ENTRADA, SALIDA y
+        TRASPASO (de warehouse_id a to_warehouse_id) y con signo para AJUSTE.
+        warehouse_id por omisión es el almacén principal del producto.
+        """
+        if kind not in self.MOVEMENT_KINDS:
+            raise ValueError(f"Tipo de movimiento inválido: {kind}")
+        quantity = int(quantity)
+        if quantity == 0 or (kind != "AJUSTE" and quantity < 0):
+            raise ValueError("Cantidad inválida.")
+
         c = self.conn.cursor()
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        c.execute("SELECT almacen FROM productos WHERE id = ?", (product_id,))
+        row = c.fetchone()
+        if row is None:
+            raise ValueError("Producto no encontrado.")
+        if warehouse_id is None:
+            warehouse_id = row[0]
+        if warehouse_id is None:
+            raise ValueError("Indique el almacén del movimiento.")
+
+        if kind == "TRASPASO":
+            if to_warehouse_id is None or to_warehouse_id == warehouse_id:
+                raise ValueError("Indique un almacén destino distinto al de origen.")
+            movements = [
+                (product_id, warehouse_id, kind, -quantity, note),
+                (product_id, to_warehouse_id, kind, quantity, note),
+            ]
+        else:
+            delta = -quantity if kind == "SALIDA" else quantity
+            movements = [(product_id, warehouse_id, kind, delta, note)]
+
+        outgoing = sum(q for _, w, _, q, _ in movements if w == warehouse_id)
+        if outgoing < 0 and self._stock_balance(c, product_id, warehouse_id) + outgoing < 0:
+            raise ValueError("No hay existencias suficientes en el almacén.")
+
+        self._post_movements(c, movements, username, now)
         c.execute(
             """
-            SELECT fecha_hora_creacion,
-                   fecha_hora_ultima_modificacion,
-                   ultimo_usuario_en_modificar
-            FROM productos
+            UPDATE productos
+            SET cantidad = cantidad + ?,
+                fecha_hora_ultima_modificacion = ?,
+                ultimo_usuario_en_modificar = ?
             WHERE id = ?
             """,
-            (product_id,),
+            (sum(q for _, _, _, q, _ in movements), now, username, product_id),
+        )
+        self._commit()
+        self._notify("productos", "update", product_id)
+
+    def get_stock(self, product_id: int) -> dict:
+        """
+        Saldo actual del producto por almacén: {almacen_id: cantidad}.
+        """
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.execute(
+                "SELECT almacen, cantidad FROM existencias WHERE producto = ? AND cantidad != 0",
+                (product_id,),
+            )
+            return {warehouse_id: quantity for warehouse_id, quantity in c.fetchall()}
+
+    def get_movements(
+            self,
+            product_id: int,
+            date_from: Optional[str] = None,
+            date_to: Optional[str] = None,
+            limit: Optional[int] = 100,
+    ) -> list[StockMovement]:
+        """
+        Movimientos del producto, del más reciente al más viejo, entre dos
+        fechas "YYYY-MM-DD HH:MM:SS" opcionales (idx_movimientos_producto_fecha).
+        """
+        clauses = ["producto = ?"]
+        params: list = [product_id]
+        if date_from:
+            clauses.append("fecha_hora >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("fecha_hora <= ?")
+            params.append(date_to)
+        sql = f"""
+            SELECT id, producto, almacen, tipo, cantidad, usuario, fecha_hora, nota
+            FROM movimientos
+            {self._where(clauses)}
+            ORDER BY fecha_hora DESC, id DESC
+        """
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.row_factory = lambda cursor, row: StockMovement(*row)
+            c.execute(sql, params)
+            return c.fetchall()
+
+    def get_stock_as_of(self, product_id: int, when: str) -> dict:
+        """
+        Saldo del producto por almacén al momento when ("YYYY-MM-DD HH:MM:SS").
+        Parte del último corte que incluye al producto y solo suma los
+        movimientos posteriores, sin recorrer todo el libro. Corte y
+        movimientos se leen en la misma transacción de lectura.
+        """
+        with self._read_transaction() as conn:
+            c = conn.cursor()
+            c.execute(
+                """
+                SELECT k.id, k.fecha_hora, k.ultimo_movimiento
+                FROM existencias_corte e
+                JOIN cortes_existencias k ON k.id = e.corte
+                WHERE e.producto = ? AND k.fecha_hora <= ?
+                ORDER BY e.corte DESC
+                LIMIT 1
+                """,
+                (product_id, when),
+            )
+            snapshot = c.fetchone()
+
+            balances: dict = {}
+            since, last_movement = "", 0
+            if snapshot is not None:
+                snapshot_id, since, last_movement = snapshot
+                c.execute(
+                    "SELECT almacen, cantidad FROM existencias_corte WHERE producto = ? AND corte = ?",
+                    (product_id, snapshot_id),
+                )
+                balances = dict(c.fetchall())
+
+            # fecha_hora >= since solo acota el índice; el id decide qué ya contó el corte
+            c.execute(
+                """
+                SELECT almacen, SUM(cantidad)
+                FROM movimientos
+                WHERE producto = ? AND fecha_hora >= ? AND fecha_hora <= ? AND id > ?
+                GROUP BY almacen
+                """,
+                (product_id, since, when, last_movement),
+            )
+            for warehouse_id, quantity in c.fetchall():
+                balances[warehouse_id] = balances.get(warehouse_id, 0) + quantity
+
+        return {w: q for w, q in balances.items() if q}
+
+    @synchronized
+    def take_stock_snapshot(self) -> int:
+        """
+        Guarda un corte del saldo. Solo copia los productos que tuvieron
+        movimientos desde el corte anterior; para los demás sigue valiendo
+        su corte más reciente. Regresa el id del corte.
+        """
+        c = self.conn.cursor()
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        c.execute("SELECT COALESCE(MAX(ultimo_movimiento), 0) FROM cortes_existencias")
+        previous_last = c.fetchone()[0]
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM movimientos")
+        last_movement = c.fetchone()[0]
+
+        c.execute(
+            "INSERT INTO cortes_existencias (fecha_hora, ultimo_movimiento) VALUES (?, ?)",
+            (now, last_movement),
         )
-        return c.fetchone()
+        snapshot_id = c.lastrowid
+        c.execute(
+            """
+            INSERT INTO existencias_corte (corte, producto, almacen, cantidad)
+            SELECT ?, e.producto, e.almacen, e.cantidad
+            FROM existencias e
+            WHERE e.producto IN (
+                SELECT producto FROM movimientos WHERE id > ? AND id <= ?
+            )
+            """,
+            (snapshot_id, previous_last, last_movement),
+        )
+        self._commit()
+        return snapshot_id
+
+    def _take_due_stock_snapshot(self) -> None:
+        c = self.conn.cursor()
+        c.execute("SELECT MAX(fecha_hora) FROM cortes_existencias")
+        last = c.fetchone()[0]
+        due = datetime.datetime.now() - datetime.timedelta(days=self.config.stock_snapshot_days)
+        if last is None or last <= due.strftime("%Y-%m-%d %H:%M:%S"):
+            self.take_stock_snapshot()
 
     # ------------------------------------------------------------------
-    #  ALMACENES
+    #  RESUMEN (PANTALLA DE INICIO)
     # ------------------------------------------------------------------
 
-    def list_warehouses(self) -> list[Warehouse]:
+    LOW_STOCK_THRESHOLD = migrations.LOW_STOCK_THRESHOLD
+
+    def get_dashboard(self, low_stock_limit: int = 10, recent_limit: int = 10) -> Dashboard:
+        """
+        Indicadores de la pantalla de inicio. Los totales salen de
+        resumen_almacenes (una fila por almacén, al día por triggers) y las
+        dos listas de índices con LIMIT: nada aquí recorre productos.
+        """
+        names = self.warehouse_catalog().id_to_name
+        row_factory = self._product_row_factory()
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.execute(
+                """
+                SELECT almacen, productos, valor_centavos, bajo_existencias
+                FROM resumen_almacenes
+                WHERE productos > 0
+                ORDER BY valor_centavos DESC
+                """
+            )
+            warehouses = tuple(
+                WarehouseSummary(
+                    warehouse_id or None,
+                    names.get(warehouse_id),
+                    products,
+                    cents / 100,
+                    low_stock,
+                )
+                for warehouse_id, products, cents, low_stock in c.fetchall()
+            )
+
+            c.row_factory = row_factory
+            c.execute(
+                f"""
+                SELECT {PRODUCT_COLUMNS}
+                FROM productos p
+                WHERE p.cantidad <= ?
+                ORDER BY p.cantidad, p.id
+                LIMIT ?
+                """,
+                (self.LOW_STOCK_THRESHOLD, low_stock_limit),
+            )
+            low_stock = c.fetchall()
+            c.execute(
+                f"""
+                SELECT {PRODUCT_COLUMNS}
+                FROM productos p
+                ORDER BY p.fecha_hora_ultima_modificacion DESC, p.id DESC
+                LIMIT ?
+                """,
+                (recent_limit,),
+            )
+            recent = c.fetchall()
+
+        return Dashboard(
+            total_value=sum(w.value for w in warehouses),
+            total_products=sum(w.products for w in warehouses),
+            total_low_stock=sum(w.low_stock for w in warehouses),
+            warehouses=warehouses,
+            low_stock=low_stock,
+            recent=recent,
+        )
+
+    # ------------------------------------------------------------------
+    #  EDICIÓN MASIVA
+    # ------------------------------------------------------------------
+
+    def list_product_ids(self, filters: Optional[dict] = None) -> list[int]:
+        """Los ids que cumplen filters, para aplicar una edición masiva."""
+        clauses, params = self._product_filters_sql(filters)
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.execute(f"SELECT p.id FROM productos p {self._where(clauses)}", params)
+            return [row[0] for row in c.fetchall()]
+
+    def _bulk_edit(
+            self, product_ids, edit: Callable[[sqlite3.Cursor, str, str], int], op: str = "update"
+    ) -> int:
+        """
+        Corre edit(cursor, ids_json, now) en una sola transacción (se revierte
+        completa si falla) y avisa una vez con todos los ids afectados.
+        """
+        product_ids = tuple(dict.fromkeys(int(i) for i in product_ids))
+        if not product_ids:
+            return 0
         c = self.conn.cursor()
-        c.execute("SELECT * FROM almacenes ORDER BY id")
-        rows = c.fetchall()
-
-        warehouses: List[Warehouse] = []
-        for r in rows:
-            last_modified = None
-            if "fecha_hora_ultima_modificacion" in r.keys():
-                last_modified = r["fecha_hora_ultima_modificacion"]
-
-            warehouses.append(
-                Warehouse(
-                    id=r["id"],
-                    name=r["nombre"],
-                    last_modified=last_modified,
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaction():
+            affected = edit(c, self._ids_param(product_ids), now)
+            if affected:
+                self._notify("productos", op, row_ids=product_ids)
+        return affected
+
+    @synchronized
+    def bulk_reprice(self, product_ids, percent: float, username: str) -> int:
+        """Sube (o baja, con percent negativo) el precio de los productos en percent %."""
+        percent = float(percent)
+        if percent <= -100:
+            raise ValueError("El porcentaje debe ser mayor a -100.")
+
+        def edit(c, ids, now):
+            c.execute(
+                f"""
+                UPDATE productos
+                SET precio = ROUND(precio * ?, 2),
+                    fecha_hora_ultima_modificacion = ?,
+                    ultimo_usuario_en_modificar = ?
+                WHERE id IN ({self._IDS_SQL})
+                """,
+                (1 + percent / 100, now, username, ids),
+            )
+            return c.rowcount
+
+        return self._bulk_edit(product_ids, edit)
+
+    @synchronized
+    def bulk_move_warehouse(self, product_ids, warehouse_id: int, username: str) -> int:
+        """
+        Cambia el almacén principal de los productos; como en update_product,
+        el saldo del almacén anterior se traspasa al nuevo.
+        """
+        self._check_warehouse(warehouse_id)
+
+        def edit(c, ids, now):
+            note = "cambio de almacén principal"
+            self._post_movements_query(
+                c,
+                f"""
+                SELECT e.producto, e.almacen, 'TRASPASO', -e.cantidad, ?
+                FROM productos p JOIN existencias e
+                     ON e.producto = p.id AND e.almacen = p.almacen
+                WHERE p.id IN ({self._IDS_SQL}) AND p.almacen != ?
+                UNION ALL
+                SELECT e.producto, ?, 'TRASPASO', e.cantidad, ?
+                FROM productos p JOIN existencias e
+                     ON e.producto = p.id AND e.almacen = p.almacen
+                WHERE p.id IN ({self._IDS_SQL}) AND p.almacen != ?
+                """,
+                (note, ids, warehouse_id, warehouse_id, note, ids, warehouse_id),
+                username,
+                now,
+            )
+            c.execute(
+                f"""
+                UPDATE productos
+                SET almacen = ?,
+                    fecha_hora_ultima_modificacion = ?,
+                    ultimo_usuario_en_modificar = ?
+                WHERE id IN ({self._IDS_SQL}) AND almacen IS NOT ?
+                """,
+                (warehouse_id, now, username, ids, warehouse_id),
+            )
+            return c.rowcount
+
+        return self._bulk_edit(product_ids, edit)
+
+    @synchronized
+    def bulk_adjust_stock(self, product_ids, delta: int, username: str) -> int:
+        """
+        Suma delta (con signo) a la cantidad de cada producto, como ajuste en
+        su almacén principal. Si a alguno no le alcanza no se aplica a ninguno.
+        """
+        delta = int(delta)
+        if delta == 0:
+            raise ValueError("Cantidad inválida.")
+
+        def edit(c, ids, now):
+            if delta < 0:
+                c.execute(
+                    f"""
+                    SELECT COUNT(*)
+                    FROM productos p LEFT JOIN existencias e
+                         ON e.producto = p.id AND e.almacen = p.almacen
+                    WHERE p.id IN ({self._IDS_SQL})
+                      AND p.almacen IS NOT NULL
+                      AND COALESCE(e.cantidad, 0) + ? < 0
+                    """,
+                    (ids, delta),
                 )
+                short = c.fetchone()[0]
+                if short:
+                    raise ValueError(
+                        f"{short} producto(s) quedarían en negativo en su almacén principal."
+                    )
+            self._post_movements_query(
+                c,
+                f"""
+                SELECT id, almacen, 'AJUSTE', ?, 'ajuste masivo'
+                FROM productos
+                WHERE id IN ({self._IDS_SQL}) AND almacen IS NOT NULL
+                """,
+                (delta, ids),
+                username,
+                now,
+            )
+            c.execute(
+                f"""
+                UPDATE productos
+                SET cantidad = cantidad + ?,
+                    fecha_hora_ultima_modificacion = ?,
+                    ultimo_usuario_en_modificar = ?
+                WHERE id IN ({self._IDS_SQL}) AND almacen IS NOT NULL
+                """,
+                (delta, now, username, ids),
             )
-        return warehouses
+            return c.rowcount
+
+        return self._bulk_edit(product_ids, edit)
+
+    @synchronized
+    def bulk_delete_products(self, product_ids, username: Optional[str] = None) -> int:
+        """delete_product para muchos productos, en una sola transacción."""
+
+        def delete(c, ids, now):
+            self._post_movements_query(
+                c,
+                f"""
+                SELECT producto, almacen, 'AJUSTE', -cantidad, 'baja del producto'
+                FROM existencias
+                WHERE producto IN ({self._IDS_SQL})
+                """,
+                (ids,),
+                username,
+                now,
+            )
+            if username is not None:
+                c.execute(
+                    f"""
+                    UPDATE productos
+                    SET fecha_hora_ultima_modificacion = ?, ultimo_usuario_en_modificar = ?
+                    WHERE id IN ({self._IDS_SQL})
+                    """,
+                    (now, username, ids),
+                )
+            c.execute(f"DELETE FROM existencias WHERE producto IN ({self._IDS_SQL})", (ids,))
+            c.execute(f"DELETE FROM productos WHERE id IN ({self._IDS_SQL})", (ids,))
+            return c.rowcount
+
+        return self._bulk_edit(product_ids, delete, "delete")
+
+    # ------------------------------------------------------------------
+    #  ALMACENES
+    # ------------------------------------------------------------------
+
+    def list_warehouses(self) -> list[Warehouse]:
+        return self.search_warehouses()
+
+    def search_warehouses(
+            self,
+            filters: Optional[dict] = None,
+            limit: Optional[int] = None,
+            after_id: Optional[int] = None,
+            before_id: Optional[int] = None,
+            order_by: str = "id",
+            descending: bool = False,
+            after: Optional[tuple] = None,
+            before: Optional[tuple] = None,
+    ) -> list[Warehouse]:
+        """
+        Igual que search_products pero para almacenes (filtros id y name,
+        orden de WAREHOUSE_SORTS, cursores de warehouse_cursor()). Se
+        resuelve sobre el catálogo en memoria, sin consultar la base.
+        """
+        if after_id is not None:
+            after = (after_id,)
+        if before_id is not None:
+            before = (before_id,)
+
+        warehouses = self.warehouse_catalog().warehouses
+        filters = filters or {}
+        if filters.get("id") not in (None, ""):
+            warehouse_id = int(filters["id"])
+            warehouses = [w for w in warehouses if w.id == warehouse_id]
+        if filters.get("name"):
+            needle = filters["name"].lower()
+            warehouses = [w for w in warehouses if needle in w.name.lower()]
+
+        def cursor(w):
+            return warehouse_cursor(w, order_by)
+
+        if order_by != "id" or descending:
+            warehouses = sorted(warehouses, key=cursor, reverse=descending)
+        if after is not None:
+            if descending:
+                warehouses = [w for w in warehouses if cursor(w) < after]
+            else:
+                warehouses = [w for w in warehouses if cursor(w) > after]
+        if before is not None:
+            if descending:
+                warehouses = [w for w in warehouses if cursor(w) > before]
+            else:
+                warehouses = [w for w in warehouses if cursor(w) < before]
+            if limit is not None:
+                return list(warehouses[-limit:]) if limit else []
+        if limit is not None:
+            return list(warehouses[:limit])
+        return list(warehouses)
+
+    def warehouse_catalog(self) -> WarehouseCatalog:
+        """
+        Todos los almacenes con sus mapas id -> nombre y nombre -> id. Se
+        carga una vez y solo se vuelve a leer después de add_warehouse,
+        update_warehouse, delete_warehouse o una importación de almacenes.
+        Dentro de transaction(), si el bloque ya cambió almacenes, se lee
+        directo sin guardarlo.
+        """
+        if self._in_transaction() and any(
+                event[0] == "almacenes" for event in self._pending_events
+        ):
+            return self._load_warehouse_catalog()
 
+        # el candado también cuida los contadores; solo se sostiene un rato
+        # mientras se recarga el catálogo
+        with self._catalog_lock:
+            if self._warehouse_catalog is not None:
+                self.warehouse_cache_hits += 1
+                return self._warehouse_catalog
+
+            self.warehouse_cache_misses += 1
+            generation = self._catalog_generation
+            catalog = self._load_warehouse_catalog()
+            # si otro hilo modificó almacenes mientras se leía, no se guarda
+            if generation == self._catalog_generation:
+                self._warehouse_catalog = catalog
+            return catalog
+
+    def _check_warehouse(self, warehouse_id: Optional[int]) -> None:
+        """Con la llave foránea un id desconocido fallaría como IntegrityError."""
+        if warehouse_id is not None and warehouse_id not in self.warehouse_catalog().id_to_name:
+            raise ValueError("Almacén no encontrado.")
+
+    def _load_warehouse_catalog(self) -> WarehouseCatalog:
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.row_factory = _warehouse_row
+            c.execute(f"SELECT {WAREHOUSE_COLUMNS} FROM almacenes ORDER BY id")
+            warehouses = tuple(c.fetchall())
+        return WarehouseCatalog(
+            warehouses=warehouses,
+            id_to_name={w.id: w.name for w in warehouses},
+            name_to_id={w.name: w.id for w in warehouses},
+        )
+
+    def warehouse_cache_stats(self) -> dict:
+        with self._catalog_lock:
+            return {
+                "loaded": self._warehouse_catalog is not None,
+                "hits": self.warehouse_cache_hits,
+                "misses": self.warehouse_cache_misses,
+            }
+
+    @synchronized
     def add_warehouse(self, warehouse_id: int, name: str, username: str) -> None:
+        if warehouse_id in self.warehouse_catalog().id_to_name:
+            raise ValueError("Ya existe un almacén con ese ID.")
 
         c = self.conn.cursor()
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -293,9 +1901,10 @@ class Database:
         """,
         (warehouse_id, name, now, now, username),
         )
-        self.conn.commit()
-
+        self._commit()
+        self._notify("almacenes", "insert", warehouse_id)
 
+    @synchronized
     def update_warehouse(self, warehouse_id: int, name: str, username: str) -> None:
         c = self.conn.cursor()
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -310,23 +1919,426 @@ class Database:
         """,
         (name, now, username, warehouse_id),
         )
-        self.conn.commit()
+        self._commit()
+        if c.rowcount:
+            self._notify("almacenes", "update", warehouse_id)
+
+    @synchronized
+    def delete_warehouse(self, warehouse_id: int, username: Optional[str] = None) -> None:
+        """
+        Si el almacén todavía tiene productos o existencias se aplica
+        config.warehouse_delete_policy: con "restrict" no se elimina
+        (ValueError) y con "reassign" productos y saldo pasan a
+        config.default_warehouse_id. Todo por conjuntos sobre
+        idx_productos_almacen e idx_existencias_almacen, en una transacción.
+        """
+        policy = self.config.warehouse_delete_policy
+        if policy not in WAREHOUSE_DELETE_POLICIES:
+            raise ValueError(f"Política de baja de almacén desconocida: {policy!r}")
 
-    def delete_warehouse(self, warehouse_id: int) -> None:
         c = self.conn.cursor()
-        c.execute("DELETE FROM almacenes WHERE id = ?", (warehouse_id,))
-        self.conn.commit()
+        c.execute("SELECT COUNT(*) FROM productos WHERE almacen = ?", (warehouse_id,))
+        products = c.fetchone()[0]
+        c.execute(
+            "SELECT COUNT(*) FROM existencias WHERE almacen = ? AND cantidad != 0",
+            (warehouse_id,),
+        )
+        balances = c.fetchone()[0]
+
+        target = None
+        if products or balances:
+            if policy == "restrict":
+                raise ValueError(
+                    f"El almacén tiene {products} productos asignados y existencias de "
+                    f"{balances} productos. Muévalos a otro almacén antes de eliminarlo."
+                )
+            target = self.config.default_warehouse_id
+            if target == warehouse_id or target not in self.warehouse_catalog().id_to_name:
+                raise ValueError("No hay un almacén predeterminado válido para reasignar los productos.")
+
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.transaction():
+            if target is not None:
+                self._reassign_warehouse(c, warehouse_id, target, username, now)
+                self._notify("productos", "bulk")
+            if username is not None:
+                c.execute(
+                    """
+                    UPDATE almacenes
+                    SET fecha_hora_ultima_modificacion = ?, ultimo_usuario_en_modificar = ?
+                    WHERE id = ?
+                    """,
+                    (now, username, warehouse_id),
+                )
+            # solo quedan saldos en cero y el renglón vacío del resumen
+            c.execute("DELETE FROM existencias WHERE almacen = ?", (warehouse_id,))
+            c.execute(
+                "DELETE FROM resumen_almacenes WHERE almacen = ? AND productos = 0",
+                (warehouse_id,),
+            )
+            c.execute("DELETE FROM almacenes WHERE id = ?", (warehouse_id,))
+            if c.rowcount:
+                self._notify("almacenes", "delete", warehouse_id)
+
+    def _reassign_warehouse(
+            self, c: sqlite3.Cursor, warehouse_id: int, target: int, username: Optional[str], now: str
+    ) -> None:
+        """Traspasa el saldo de warehouse_id a target y le cambia el almacén a sus productos."""
+        note = f"baja del almacén {warehouse_id}"
+        self._post_movements_query(
+            c,
+            """
+            SELECT producto, almacen, 'TRASPASO', -cantidad, ?
+            FROM existencias WHERE almacen = ? AND cantidad != 0
+            UNION ALL
+            SELECT producto, ?, 'TRASPASO', cantidad, ?
+            FROM existencias WHERE almacen = ? AND cantidad != 0
+            """,
+            (note, warehouse_id, target, note, warehouse_id),
+            username,
+            now,
+        )
+        c.execute(
+            """
+            UPDATE productos
+            SET almacen = ?,
+                fecha_hora_ultima_modificacion = ?,
+                ultimo_usuario_en_modificar = COALESCE(?, ultimo_usuario_en_modificar)
+            WHERE almacen = ?
+            """,
+            (target, now, username, warehouse_id),
+        )
 
     def get_warehouse_audit(self, warehouse_id: int):
+        with self._reader() as conn:
+            c = conn.cursor()
+            c.execute(
+                """
+                SELECT fecha_hora_creacion,
+                       fecha_hora_ultima_modificacion,
+                       ultimo_usuario_en_modificar
+                FROM almacenes
+                WHERE id = ?
+                """,
+                (warehouse_id,),
+            )
+            return c.fetchone()
+
+    # ------------------------------------------------------------------
+    #  CARGA MASIVA
+    # ------------------------------------------------------------------
+
+    BULK_CHUNK_SIZE = 1000
+
+    def _warehouse_ids_by_name(self) -> dict:
+        catalog = self.warehouse_catalog()
+        return {name.strip().lower(): wid for name, wid in catalog.name_to_id.items()}
+
+    @staticmethod
+    def _row_line(row: dict, index: int) -> int:
+        return row.get("_line", index)
+
+    @staticmethod
+    def _optional_int(value) -> Optional[int]:
+        if value is None or str(value).strip() == "":
+            return None
+        number = float(value)
+        # "2.7" no se trunca a 2; nan e inf tampoco son enteros
+        if not number.is_integer():
+            raise ValueError(f"no es un entero: {value!r}")
+        return int(number)
+
+    def _validate_product_row(self, row: dict, warehouse_ids: dict, known_ids: set) -> tuple:
+        """
+        Convierte una fila de importación en la tupla del INSERT. Lanza
+        ValueError con el motivo si la fila no es válida.
+        """
+        name = str(row.get("nombre") or "").strip()
+        if not name:
+            raise ValueError("nombre vacío")
+
+        try:
+            price = float(row.get("precio"))
+        except (TypeError, ValueError):
+            raise ValueError(f"precio inválido: {row.get('precio')!r}")
+        if not math.isfinite(price):
+            raise ValueError(f"precio inválido: {row.get('precio')!r}")
+        try:
+            stock = self._optional_int(row.get("cantidad"))
+        except ValueError:
+            raise ValueError(f"cantidad inválida: {row.get('cantidad')!r}")
+        if stock is None:
+            raise ValueError("cantidad vacía")
+
+        warehouse = row.get("almacen")
+        warehouse_text = str(warehouse if warehouse is not None else "").strip()
+        if not warehouse_text:
+            raise ValueError("almacén vacío")
+        if warehouse_text.isdigit() and int(warehouse_text) in known_ids:
+            warehouse_id = int(warehouse_text)
+        elif warehouse_text.lower() in warehouse_ids:
+            warehouse_id = warehouse_ids[warehouse_text.lower()]
+        else:
+            raise ValueError(f"almacén desconocido: {warehouse_text!r}")
+
+        try:
+            product_id = self._optional_int(row.get("id"))
+        except ValueError:
+            raise ValueError(f"id inválido: {row.get('id')!r}")
+
+        description = str(row.get("departamento") or "").strip()
+        return product_id, name, price, stock, description, warehouse_id
+
+    def _bulk_execute(
+            self,
+            sql: str,
+            tuples,
+            chunk_size: int,
+            progress,
+            result: ImportResult,
+            finish: Optional[Callable[[sqlite3.Cursor], None]] = None,
+            setup: Optional[Callable[[sqlite3.Cursor], None]] = None,
+    ) -> None:
+        """
+        Ejecuta executemany por bloques dentro de una sola transacción con
+        synchronous=NORMAL; setup(cursor) corre al abrirla y finish(cursor)
+        antes del commit. Si algo
+        falla se revierte todo. Dentro de transaction() el commit (y el
+        synchronous) quedan como los tenga el bloque exterior: SQLite no deja
+        cambiar synchronous con una transacción abierta.
+        """
         c = self.conn.cursor()
+        previous_sync = None
+        if not self.conn.in_transaction:
+            c.execute("PRAGMA synchronous")
+            previous_sync = c.fetchone()[0]
+            c.execute("PRAGMA synchronous = NORMAL")
+        try:
+            with self.transaction():
+                if setup is not None:
+                    setup(c)
+                chunk = []
+                for values in tuples:
+                    chunk.append(values)
+                    if len(chunk) >= chunk_size:
+                        c.executemany(sql, chunk)
+                        result.imported += len(chunk)
+                        chunk.clear()
+                        if progress is not None:
+                            progress(result)
+                if chunk:
+                    c.executemany(sql, chunk)
+                    result.imported += len(chunk)
+                if finish is not None:
+                    finish(c)
+        except Exception:
+            result.imported = 0
+            raise
+        finally:
+            if previous_sync is not None:
+                c.execute(f"PRAGMA synchronous = {int(previous_sync)}")
+
+        if progress is not None:
+            progress(result)
+
+    @staticmethod
+    def _track_imported_products(c: sqlite3.Cursor) -> None:
+        """
+        Triggers temporales (solo de esta conexión y esta transacción) que
+        anotan en temp.productos_importados el id de cada producto que la
+        carga inserta o actualiza y, si ya existía, su almacén anterior (el
+        de antes de la primera escritura de la carga).
+        """
+        c.execute("DROP TABLE IF EXISTS temp.productos_importados")
         c.execute(
+            "CREATE TEMP TABLE productos_importados (id INTEGER PRIMARY KEY, almacen_anterior)"
+        )
+        for event, previous in (("INSERT", "NULL"), ("UPDATE", "old.almacen")):
+            c.execute(
+                f"""
+                CREATE TEMP TRIGGER productos_importados_{event.lower()}
+                AFTER {event} ON productos BEGIN
+                    INSERT OR IGNORE INTO productos_importados (id, almacen_anterior)
+                    VALUES (new.id, {previous});
+                END
+                """
+            )
+
+    def _reconcile_stock(self, c: sqlite3.Cursor, username: str, now: str) -> None:
+        """
+        Después de una carga, para cada producto que tocó (los de
+        temp.productos_importados): si cambió su almacén principal el saldo
+        del anterior se traspasa al nuevo, como en bulk_move_warehouse, y si
+        su total ya no cuadra con su saldo la diferencia queda como ajuste
+        en el almacén principal. Todo en SQL, por conjuntos.
+        """
+        c.execute("DROP TRIGGER temp.productos_importados_insert")
+        c.execute("DROP TRIGGER temp.productos_importados_update")
+        note = "cambio de almacén principal"
+        self._post_movements_query(
+            c,
             """
-            SELECT fecha_hora_creacion,
-                   fecha_hora_ultima_modificacion,
-                   ultimo_usuario_en_modificar
-            FROM almacenes
-            WHERE id = ?
+            SELECT e.producto, e.almacen, 'TRASPASO', -e.cantidad, ?
+            FROM temp.productos_importados i
+            JOIN productos p ON p.id = i.id
+            JOIN existencias e ON e.producto = i.id AND e.almacen = i.almacen_anterior
+            WHERE p.almacen IS NOT i.almacen_anterior AND p.almacen IS NOT NULL
+            UNION ALL
+            SELECT e.producto, p.almacen, 'TRASPASO', e.cantidad, ?
+            FROM temp.productos_importados i
+            JOIN productos p ON p.id = i.id
+            JOIN existencias e ON e.producto = i.id AND e.almacen = i.almacen_anterior
+            WHERE p.almacen IS NOT i.almacen_anterior AND p.almacen IS NOT NULL
             """,
-            (warehouse_id,),
+            (note, note),
+            username,
+            now,
+        )
+        self._post_movements_query(
+            c,
+            """
+            SELECT p.id, p.almacen, 'AJUSTE',
+                   p.cantidad - COALESCE(
+                       (SELECT SUM(e.cantidad) FROM existencias e WHERE e.producto = p.id), 0
+                   ),
+                   'importación'
+            FROM temp.productos_importados i
+            JOIN productos p ON p.id = i.id
+            WHERE p.almacen IS NOT NULL
+            """,
+            (),
+            username,
+            now,
         )
-        return c.fetchone()
\ No newline at end of file
+        c.execute("DROP TABLE temp.productos_importados")
+
+    @synchronized
+    def bulk_upsert_products(
+            self,
+            rows: Iterable[dict],
+            username: str,
+            chunk_size: int = BULK_CHUNK_SIZE,
+            progress: Optional[Callable[[ImportResult], None]] = None,
+    ) -> ImportResult:
+        """
+        Inserta o actualiza (por id) muchos productos en una transacción.
+
+        Cada fila es un dict con nombre, departamento, precio, cantidad,
+        almacen (id o nombre) y opcionalmente id y _line. Las filas inválidas
+        no detienen la carga: se reportan en ImportResult.rejected.
+        """
+        result = ImportResult()
+        warehouse_ids = self._warehouse_ids_by_name()
+        known_ids = set(warehouse_ids.values())
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def valid_rows():
+            for index, row in enumerate(rows, start=1):
+                try:
+                    values = self._validate_product_row(row, warehouse_ids, known_ids)
+                except ValueError as exc:
+                    result.rejected.append((self._row_line(row, index), str(exc)))
+                    continue
+                yield values + (now, now, username)
+
+        self._bulk_execute(
+            """
+            INSERT INTO productos
+            (id, nombre, precio, cantidad, departamento, almacen,
+             fecha_hora_creacion, fecha_hora_ultima_modificacion, ultimo_usuario_en_modificar)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                nombre = excluded.nombre,
+                precio = excluded.precio,
+                cantidad = excluded.cantidad,
+                departamento = excluded.departamento,
+                almacen = excluded.almacen,
+                fecha_hora_ultima_modificacion = excluded.fecha_hora_ultima_modificacion,
+                ultimo_usuario_en_modificar = excluded.ultimo_usuario_en_modificar
+            """,
+            valid_rows(),
+            chunk_size,
+            progress,
+            result,
+            finish=lambda c: self._reconcile_stock(c, username, now),
+            setup=self._track_imported_products,
+        )
+        if result.imported:
+            self._notify("productos", "bulk")
+        return result
+
+    @synchronized
+    def bulk_upsert_warehouses(
+            self,
+            rows: Iterable[dict],
+            username: str,
+            chunk_size: int = BULK_CHUNK_SIZE,
+            progress: Optional[Callable[[ImportResult], None]] = None,
+    ) -> ImportResult:
+        """
+        Igual que bulk_upsert_products para almacenes (id y nombre).
+        """
+        result = ImportResult()
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def valid_rows():
+            for index, row in enumerate(rows, start=1):
+                name = str(row.get("nombre") or "").strip()
+                try:
+                    warehouse_id = self._optional_int(row.get("id"))
+                except ValueError:
+                    warehouse_id = None
+                if warehouse_id is None or not name:
+                    result.rejected.append((self._row_line(row, index), "id o nombre inválido"))
+                    continue
+                yield warehouse_id, name, now, now, username
+
+        self._bulk_execute(
+            """
+            INSERT INTO almacenes
+            (id, nombre, fecha_hora_creacion, fecha_hora_ultima_modificacion, ultimo_usuario_en_modificar)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                nombre = excluded.nombre,
+                fecha_hora_ultima_modificacion = excluded.fecha_hora_ultima_modificacion,
+                ultimo_usuario_en_modificar = excluded.ultimo_usuario_en_modificar
+            """,
+            valid_rows(),
+            chunk_size,
+            progress,
+            result,
+        )
+        if result.imported:
+            self._notify("almacenes", "bulk")
+        return result
+
+
+# Métodos públicos que no se cronometran: context managers (el commit de
+# transaction se mide aparte, en _end_transaction) y los que solo leen
+# contadores en memoria
+_NOT_INSTRUMENTED = {
+    "subscribe",
+    "close",
+    "cancellable",
+    "transaction",
+    "get_query_stats",
+    "reset_query_stats",
+    "pool_stats",
+    "product_cache_stats",
+    "warehouse_cache_stats",
+}
+
+
+def instrumentable_methods() -> list:
+    """(nombre, función) de los métodos públicos de Database que se cronometran."""
+    return [
+        (name, method)
+        for name, method in vars(Database).items()
+        if not name.startswith("_")
+        and name not in _NOT_INSTRUMENTED
+        and inspect.isfunction(method)
+    ]
+
+
+for _name, _method in instrumentable_methods():
+    setattr(Database, _name, instrumented(_method))
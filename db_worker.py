@@ -0,0 +1,144 @@
+import itertools
+import queue
+import threading
+from tkinter import messagebox
+from typing import Callable, Optional
+
+
+class DatabaseWorker:
+    """
+    Ejecuta las llamadas a Database en un hilo aparte para no congelar el
+    ciclo principal de Tk. Los resultados regresan al hilo de Tk con after()
+    y se entregan al callback (o al errback si hubo excepción).
+
+    Las tareas enviadas con la misma key se reemplazan entre sí: si llega
+    una búsqueda nueva, la anterior se descarta aunque ya esté en cola o su
+    resultado ya haya llegado, y si ya está corriendo su consulta se
+    interrumpe (Database.cancellable).
+    """
+
+    POLL_MS = 30
+
+    def __init__(self, widget, db):
+        self.widget = widget
+        self.db = db
+
+        self._jobs: queue.Queue = queue.Queue()
+        self._results: queue.Queue = queue.Queue()
+        self._latest: dict = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # (key, evento de cancelación) de la tarea que está corriendo
+        self._running: Optional[tuple] = None
+        self._stopped = False
+
+        self._thread = threading.Thread(target=self._run, name="db-worker", daemon=True)
+        self._thread.start()
+        self._poll_id = self.widget.after(self.POLL_MS, self._poll)
+
+    # --------- API ---------
+
+    def submit(
+            self,
+            fn: Callable,
+            *args,
+            callback: Optional[Callable] = None,
+            errback: Optional[Callable] = None,
+            key: Optional[str] = None,
+            **kwargs,
+    ) -> int:
+        job_id = next(self._ids)
+        if key is not None:
+            with self._lock:
+                self._latest[key] = job_id
+                self._interrupt(key)
+        self._jobs.put((job_id, key, fn, args, kwargs, callback, errback))
+        return job_id
+
+    def notify(self, handler: Callable, value) -> None:
+        """
+        Entrega value a handler en el hilo de Tk; sirve para reportar el
+        avance de una tarea que sigue corriendo.
+        """
+        self._results.put((0, None, handler, value, False))
+
+    def cancel(self, key: str) -> None:
+        """
+        Marca como obsoletas todas las tareas pendientes con esa key.
+        """
+        with self._lock:
+            self._latest[key] = None
+            self._interrupt(key)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._jobs.put(None)
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+
+    # --------- INTERNOS ---------
+
+    def _interrupt(self, key: str) -> None:
+        # se llama con self._lock tomado
+        if self._running is not None and self._running[0] == key:
+            self._running[1].set()
+
+    def _is_current(self, job_id: int, key: Optional[str]) -> bool:
+        if key is None:
+            return True
+        with self._lock:
+            return self._latest.get(key) == job_id
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+
+            job_id, key, fn, args, kwargs, callback, errback = job
+            cancelled = threading.Event()
+            with self._lock:
+                # revisar y registrar juntos: un submit() posterior siempre
+                # encuentra la tarea en _running y la puede interrumpir
+                if key is not None and self._latest.get(key) != job_id:
+                    continue
+                self._running = (key, cancelled)
+
+            try:
+                with self.db.cancellable(cancelled):
+                    result = fn(*args, **kwargs)
+            except Exception as exc:
+                self._results.put((job_id, key, errback, exc, True))
+            else:
+                self._results.put((job_id, key, callback, result, False))
+            finally:
+                with self._lock:
+                    self._running = None
+
+    def _poll(self) -> None:
+        try:
+            self._deliver_results()
+        finally:
+            if not self._stopped:
+                self._poll_id = self.widget.after(self.POLL_MS, self._poll)
+
+    def _deliver_results(self) -> None:
+        while True:
+            try:
+                job_id, key, handler, value, failed = self._results.get_nowait()
+            except queue.Empty:
+                return
+
+            if not self._is_current(job_id, key):
+                continue
+            if failed:
+                if handler is not None:
+                    handler(value)
+                else:
+                    messagebox.showerror("Error", str(value))
+            elif handler is not None:
+                handler(value)
@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+import tempfile
+from typing import Callable, Optional
+
+from database import Database
+
+EXPORT_COLUMNS = (
+    "id",
+    "nombre",
+    "departamento",
+    "precio",
+    "cantidad",
+    "almacen",
+    "fecha_hora_ultima_modificacion",
+)
+
+PROGRESS_EVERY = 5000
+
+
+def _product_values(p) -> tuple:
+    return (
+        p.id,
+        p.name,
+        p.description,
+        p.price,
+        p.stock,
+        p.warehouse_name or "",
+        p.last_modified or "",
+    )
+
+
+def _write_csv(f, products, on_row) -> None:
+    writer = csv.writer(f)
+    writer.writerow(EXPORT_COLUMNS)
+    for p in products:
+        writer.writerow(_product_values(p))
+        on_row()
+
+
+def _write_jsonl(f, products, on_row) -> None:
+    for p in products:
+        f.write(json.dumps(dict(zip(EXPORT_COLUMNS, _product_values(p))), ensure_ascii=False))
+        f.write("\n")
+        on_row()
+
+
+def _write_xlsx(path, products, on_row) -> None:
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("Para exportar a XLSX instale openpyxl (pip install openpyxl).")
+
+    # write_only escribe las filas directo a disco en lugar de guardarlas
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Productos")
+    ws.append(EXPORT_COLUMNS)
+    for p in products:
+        ws.append(_product_values(p))
+        on_row()
+    wb.save(path)
+
+
+def export_products(
+        db: Database,
+        filters: Optional[dict],
+        path: str,
+        progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Escribe los productos que cumplen filters en CSV, XLSX o JSONL según la
+    extensión de path. Se escribe primero a un archivo temporal en la misma
+    carpeta y al final se renombra, así un error nunca deja un reporte a medias.
+    Regresa el número de filas exportadas.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in (".csv", ".xlsx", ".jsonl"):
+        raise ValueError(f"Formato no soportado: {ext or path}")
+
+    count = 0
+
+    def on_row():
+        nonlocal count
+        count += 1
+        if progress is not None and count % PROGRESS_EVERY == 0:
+            progress(count)
+
+    products = db.iter_products(filters)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=".export-", suffix=ext, dir=os.path.dirname(os.path.abspath(path))
+    )
+    try:
+        if ext == ".xlsx":
+            os.close(fd)
+            _write_xlsx(tmp_path, products, on_row)
+        else:
+            # utf-8-sig para que Excel reconozca los acentos del CSV
+            encoding = "utf-8-sig" if ext == ".csv" else "utf-8"
+            with open(fd, "w", newline="", encoding=encoding) as f:
+                if ext == ".csv":
+                    _write_csv(f, products, on_row)
+                else:
+                    _write_jsonl(f, products, on_row)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        products.close()
+
+    if progress is not None:
+        progress(count)
+    return count
@@ -0,0 +1,110 @@
+import csv
+import os
+import unicodedata
+from typing import Callable, Iterator, Optional
+
+from database import Database
+from models import ImportResult
+
+# Encabezados aceptados en el archivo -> llave que espera Database
+HEADER_ALIASES = {
+    "id": "id",
+    "nombre": "nombre",
+    "name": "nombre",
+    "departamento": "departamento",
+    "descripcion": "departamento",
+    "description": "departamento",
+    "precio": "precio",
+    "price": "precio",
+    "cantidad": "cantidad",
+    "existencias": "cantidad",
+    "stock": "cantidad",
+    "almacen": "almacen",
+    "warehouse": "almacen",
+}
+
+
+def _normalize_header(header) -> Optional[str]:
+    text = str(header or "").strip().lower()
+    text = "".join(
+        ch for ch in unicodedata.normalize("NFKD", text) if not unicodedata.combining(ch)
+    )
+    return HEADER_ALIASES.get(text)
+
+
+def _rows_from_table(rows: Iterator) -> Iterator[dict]:
+    """
+    Convierte filas (la primera es el encabezado) en dicts con las llaves
+    de Database, agregando _line con el número de línea del archivo.
+    """
+    header = next(rows, None)
+    if header is None:
+        return
+    keys = [_normalize_header(h) for h in header]
+    if "nombre" not in keys:
+        raise ValueError("El archivo no tiene una columna 'nombre'.")
+
+    for line, values in enumerate(rows, start=2):
+        if values is None or all(v in (None, "") for v in values):
+            continue
+        row = {"_line": line}
+        for key, value in zip(keys, values):
+            if key is not None:
+                row[key] = value
+        yield row
+
+
+def _iter_csv(path: str) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from _rows_from_table(csv.reader(f, dialect))
+
+
+def _iter_xlsx(path: str) -> Iterator[dict]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Para importar archivos XLSX instale openpyxl (pip install openpyxl).")
+
+    # read_only va leyendo la hoja por partes, sin cargar todo el archivo
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        yield from _rows_from_table(ws.iter_rows(values_only=True))
+    finally:
+        wb.close()
+
+
+def iter_rows(path: str) -> Iterator[dict]:
+    """
+    Lee un CSV o XLSX fila por fila.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return _iter_csv(path)
+    if ext in (".xlsx", ".xlsm"):
+        return _iter_xlsx(path)
+    raise ValueError(f"Formato no soportado: {ext or path}")
+
+
+def import_products(
+        db: Database,
+        path: str,
+        username: str,
+        progress: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    return db.bulk_upsert_products(iter_rows(path), username, progress=progress)
+
+
+def import_warehouses(
+        db: Database,
+        path: str,
+        username: str,
+        progress: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    return db.bulk_upsert_warehouses(iter_rows(path), username, progress=progress)
@@ -0,0 +1,271 @@
+import collections
+import datetime
+import functools
+import inspect
+import threading
+import time
+from typing import Callable, List, Optional
+
+# latencias que se guardan por operación para calcular percentiles
+SAMPLES = 1000
+# sentencias distintas que se anotan por operación en la bitácora lenta
+MAX_LOGGED_STATEMENTS = 20
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Percentil p (0-100) por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _row_count(result) -> int:
+    if result is None or isinstance(result, (bool, int, float, str)):
+        return 0
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+    return 1
+
+
+class OperationStats:
+    __slots__ = ("name", "calls", "errors", "rows", "commits", "statements", "total_ms", "samples")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.commits = 0
+        self.statements = 0
+        self.total_ms = 0.0
+        self.samples = collections.deque(maxlen=SAMPLES)
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self.samples)
+        return {
+            "operation": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "commits": self.commits,
+            "statements": self.statements,
+            "total_ms": self.total_ms,
+            "p50_ms": percentile(ordered, 50),
+            "p95_ms": percentile(ordered, 95),
+            "p99_ms": percentile(ordered, 99),
+        }
+
+
+class _Frame:
+    __slots__ = ("statements", "seen", "commits", "count")
+
+    def __init__(self):
+        self.statements: List[str] = []
+        self.seen = set()
+        self.commits = 0
+        self.count = 0
+
+
+class QueryStats:
+    """
+    Contadores por operación de Database: llamadas, latencia (p50/p95/p99
+    de las últimas SAMPLES), filas regresadas, commits y sentencias.
+
+    Las sentencias llegan por el trace callback de sqlite3 (on_statement),
+    que da el SQL con los parámetros ya sustituidos pero no su duración:
+    cada sentencia se atribuye a la operación que está corriendo en ese
+    hilo, y lo que se cronometra es la operación completa. Las que tardan
+    slow_ms o más se escriben en slow_log con el EXPLAIN QUERY PLAN de cada
+    sentencia; explain(sql) debe regresar las filas del plan.
+    """
+
+    def __init__(
+            self,
+            slow_ms: float,
+            slow_log: Optional[str],
+            explain: Callable[[str], list],
+    ):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.explain = explain
+        self._ops: dict = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._local = threading.local()
+        self.slow_queries = 0
+
+    # --------- CAPTURA ---------
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def on_statement(self, sql: str) -> None:
+        if getattr(self._local, "explaining", False):
+            return
+        stack = self._stack()
+        if not stack:
+            return
+        frame = stack[-1]
+        frame.count += 1
+        if sql.startswith("COMMIT"):
+            frame.commits += 1
+        elif sql not in frame.seen and not sql.startswith("--"):
+            frame.seen.add(sql)
+            frame.statements.append(sql)
+
+    def running(self) -> bool:
+        """True si en este hilo hay una operación cronometrándose."""
+        return bool(self._stack())
+
+    def call(self, name: str, method, args, kwargs):
+        stack = self._stack()
+        frame = _Frame()
+        stack.append(frame)
+        failed = False
+        result = None
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+            return result
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stack.pop()
+            self._finish(name, elapsed_ms, _row_count(result), frame, failed)
+
+    def iterate(self, name: str, method, args, kwargs):
+        """
+        Como call, para métodos generadores: solo se cronometra lo que
+        tarda cada next() (no lo que hace quien consume entre uno y otro) y
+        las filas son los elementos entregados. Se registra al agotarse o
+        cerrarse el generador.
+        """
+        stack = self._stack()
+        frame = _Frame()
+        iterator = None
+        failed = False
+        rows = 0
+        elapsed_ms = 0.0
+        try:
+            while True:
+                stack.append(frame)
+                start = time.perf_counter()
+                try:
+                    if iterator is None:
+                        iterator = method(*args, **kwargs)
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                except BaseException:
+                    failed = True
+                    raise
+                finally:
+                    elapsed_ms += (time.perf_counter() - start) * 1000
+                    stack.pop()
+                rows += 1
+                yield item
+        finally:
+            if iterator is not None:
+                # suelta lo que tenga prestado aunque el consumidor pare antes
+                iterator.close()
+            self._finish(name, elapsed_ms, rows, frame, failed)
+
+    def _finish(self, name, elapsed_ms, rows, frame, failed) -> None:
+        self._record(name, elapsed_ms, rows, frame, failed)
+        stack = self._stack()
+        if stack:
+            # lo de una operación anidada también cuenta para la de afuera
+            parent = stack[-1]
+            parent.count += frame.count
+            parent.commits += frame.commits
+            for sql in frame.statements:
+                if sql not in parent.seen:
+                    parent.seen.add(sql)
+                    parent.statements.append(sql)
+        elif elapsed_ms >= self.slow_ms:
+            self._log_slow(name, elapsed_ms, rows, frame)
+
+    def _record(self, name, elapsed_ms, rows, frame, failed) -> None:
+        with self._lock:
+            op = self._ops.get(name)
+            if op is None:
+                op = self._ops[name] = OperationStats(name)
+            op.calls += 1
+            op.errors += failed
+            op.rows += rows
+            op.commits += frame.commits
+            op.statements += frame.count
+            op.total_ms += elapsed_ms
+            op.samples.append(elapsed_ms)
+
+    # --------- BITÁCORA DE CONSULTAS LENTAS ---------
+
+    def _plan(self, sql: str) -> List[str]:
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return []
+        self._local.explaining = True
+        try:
+            return [row[3] for row in self.explain(sql)]
+        except Exception as exc:
+            # p. ej. tablas temporales que ya no existen
+            return [f"(sin plan: {exc})"]
+        finally:
+            self._local.explaining = False
+
+    def _log_slow(self, name: str, elapsed_ms: float, rows: int, frame: _Frame) -> None:
+        self.slow_queries += 1
+        if not self.slow_log:
+            return
+        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        lines = [
+            f"{now}  {name}  {elapsed_ms:.1f} ms  {rows} filas  {frame.commits} commits  "
+            f"{frame.count} sentencias  [{threading.current_thread().name}]"
+        ]
+        for sql in frame.statements[:MAX_LOGGED_STATEMENTS]:
+            lines.append("  SQL: " + " ".join(sql.split()))
+            lines.extend(f"    PLAN: {detail}" for detail in self._plan(sql))
+        omitted = len(frame.statements) - MAX_LOGGED_STATEMENTS
+        if omitted > 0:
+            lines.append(f"  ... {omitted} sentencias más")
+        with self._log_lock:
+            with open(self.slow_log, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n\n")
+
+    # --------- CONSULTA ---------
+
+    def snapshot(self) -> List[dict]:
+        """Estadísticas por operación, de mayor a menor tiempo total."""
+        with self._lock:
+            stats = [op.as_dict() for op in self._ops.values()]
+        return sorted(stats, key=lambda s: s["total_ms"], reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ops.clear()
+            self.slow_queries = 0
+
+
+def instrumented(method):
+    """
+    Cronometra method en self.query_stats cuando la instrumentación está
+    activa; si no, solo agrega una llamada. Los generadores se miden por
+    cada next() (QueryStats.iterate).
+    """
+
+    measure = "iterate" if inspect.isgeneratorfunction(method) else "call"
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self.query_stats
+        if stats is None:
+            return method(self, *args, **kwargs)
+        return getattr(stats, measure)(method.__name__, method, (self,) + args, kwargs)
+
+    return wrapper
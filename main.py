@@ -1,9 +1,36 @@
-from database import Database
+import argparse
+import os
+
+from database import Database, DatabaseConfig
 from ui import LoginWindow
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sistema de Inventario")
+    parser.add_argument(
+        "--perfil",
+        nargs="?",
+        const="perfil_tk.folded",
+        default=os.environ.get("INVENTARIO_PERFIL") or None,
+        metavar="ARCHIVO",
+        help="mide cuánto bloquea cada callback de Tk y al salir escribe las pilas "
+             "(formato collapsed) en ARCHIVO y un resumen en ARCHIVO.resumen.txt; "
+             "también con INVENTARIO_PERFIL=ARCHIVO",
+    )
+    return parser.parse_args()
+
+
 def main():
-    db = Database()
+    args = parse_args()
+    if args.perfil:
+        from tk_profiler import TkProfiler
+
+        TkProfiler(args.perfil).install()
+
+    # INVENTARIO_DIAGNOSTICO=1 activa las estadísticas por operación y la
+    # bitácora de consultas lentas (ver el botón "Diagnóstico")
+    config = DatabaseConfig(instrument=os.environ.get("INVENTARIO_DIAGNOSTICO", "0") != "0")
+    db = Database(config=config)
     login = LoginWindow(db)
     login.mainloop()
 
@@ -0,0 +1,568 @@
+import datetime
+import sqlite3
+from typing import Callable, List, Tuple
+
+# ------------------------------------------------------------------
+#  MIGRACIONES DEL ESQUEMA
+# ------------------------------------------------------------------
+#
+# La versión del esquema vive en PRAGMA user_version. Cada paso se corre
+# una sola vez, dentro de su propia transacción, y al terminar sube
+# user_version a su número. Con la base al día, migrate() solo lee el
+# PRAGMA. Para cambiar el esquema se agrega un paso nuevo al final de
+# MIGRATIONS; nunca se modifica uno que ya se publicó.
+
+
+def _columns(c: sqlite3.Cursor, table: str) -> List[str]:
+    c.execute(f"PRAGMA table_info({table})")
+    return [row[1].lower() for row in c.fetchall()]
+
+
+def _table_exists(c: sqlite3.Cursor, name: str) -> bool:
+    c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+    return c.fetchone() is not None
+
+
+def _001_base_tables(c: sqlite3.Cursor) -> None:
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            fecha_hora_ultimo_inicio TEXT,
+            rol TEXT NOT NULL
+        )
+        """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS almacenes (
+            id INTEGER PRIMARY KEY,
+            nombre TEXT NOT NULL
+        )
+        """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER NOT NULL,
+            nombre TEXT NOT NULL,
+            precio REAL NOT NULL,
+            cantidad INTEGER NOT NULL,
+            departamento TEXT NOT NULL,
+            almacen INTEGER,
+            PRIMARY KEY (id)
+        )
+        """
+    )
+
+
+def _002_audit_columns(c: sqlite3.Cursor) -> None:
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for table in ("productos", "almacenes"):
+        cols = _columns(c, table)
+        for column in (
+                "fecha_hora_creacion",
+                "fecha_hora_ultima_modificacion",
+                "ultimo_usuario_en_modificar",
+        ):
+            if column not in cols:
+                c.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+        c.execute(
+            f"UPDATE {table} SET fecha_hora_creacion = ? WHERE fecha_hora_creacion IS NULL",
+            (now,),
+        )
+
+
+def _003_product_indexes(c: sqlite3.Cursor) -> None:
+    c.execute("CREATE INDEX IF NOT EXISTS idx_productos_precio ON productos(precio)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_productos_cantidad ON productos(cantidad)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_productos_almacen ON productos(almacen)")
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_productos_nombre_nocase "
+        "ON productos(nombre COLLATE NOCASE)"
+    )
+
+
+def create_fulltext_triggers(c: sqlite3.Cursor) -> None:
+    c.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts (rowid, nombre, departamento)
+            VALUES (new.id, new.nombre, new.departamento);
+        END
+        """
+    )
+    c.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, departamento)
+            VALUES ('delete', old.id, old.nombre, old.departamento);
+        END
+        """
+    )
+    c.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS productos_fts_au
+        AFTER UPDATE OF id, nombre, departamento ON productos
+        WHEN old.id IS NOT new.id
+          OR old.nombre IS NOT new.nombre
+          OR old.departamento IS NOT new.departamento
+        BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, departamento)
+            VALUES ('delete', old.id, old.nombre, old.departamento);
+            INSERT INTO productos_fts (rowid, nombre, departamento)
+            VALUES (new.id, new.nombre, new.departamento);
+        END
+        """
+    )
+
+
+def _004_fulltext_index(c: sqlite3.Cursor) -> None:
+    """
+    productos_fts (trigram) espejo de nombre y departamento. Si este SQLite
+    no trae FTS5 el paso no hace nada y la búsqueda usa LIKE.
+    """
+    if _table_exists(c, "productos_fts"):
+        create_fulltext_triggers(c)
+        return
+    try:
+        c.execute(
+            """
+            CREATE VIRTUAL TABLE productos_fts USING fts5(
+                nombre,
+                departamento,
+                content = 'productos',
+                content_rowid = 'id',
+                tokenize = 'trigram'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        return
+    create_fulltext_triggers(c)
+    c.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+
+
+def _005_sort_indexes(c: sqlite3.Cursor) -> None:
+    """
+    Índices (columna, id) para ordenar y paginar por llave en la tabla de
+    productos. id es el rowid, así que reemplazan a los de una sola columna
+    de _003 sin ocupar más espacio.
+    """
+    c.execute("DROP INDEX IF EXISTS idx_productos_precio")
+    c.execute("DROP INDEX IF EXISTS idx_productos_cantidad")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_productos_precio_id ON productos(precio, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_productos_cantidad_id ON productos(cantidad, id)")
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_productos_departamento_nocase "
+        "ON productos(departamento COLLATE NOCASE, id)"
+    )
+
+
+def _006_stock_ledger(c: sqlite3.Cursor) -> None:
+    """
+    Libro de movimientos de inventario, saldo por (producto, almacén) y
+    cortes periódicos del saldo. El saldo inicial sale de productos.cantidad
+    y queda guardado como el primer corte.
+    """
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS movimientos (
+            id INTEGER PRIMARY KEY,
+            producto INTEGER NOT NULL,
+            almacen INTEGER NOT NULL,
+            tipo TEXT NOT NULL
+                CHECK (tipo IN ('ENTRADA', 'SALIDA', 'TRASPASO', 'AJUSTE')),
+            cantidad INTEGER NOT NULL,
+            usuario TEXT,
+            fecha_hora TEXT NOT NULL,
+            nota TEXT
+        )
+        """
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_movimientos_producto_fecha "
+        "ON movimientos(producto, fecha_hora, id)"
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS existencias (
+            producto INTEGER NOT NULL,
+            almacen INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (producto, almacen)
+        ) WITHOUT ROWID
+        """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS cortes_existencias (
+            id INTEGER PRIMARY KEY,
+            fecha_hora TEXT NOT NULL,
+            ultimo_movimiento INTEGER NOT NULL
+        )
+        """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS existencias_corte (
+            corte INTEGER NOT NULL,
+            producto INTEGER NOT NULL,
+            almacen INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (producto, corte, almacen)
+        ) WITHOUT ROWID
+        """
+    )
+
+    now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    c.execute(
+        """
+        INSERT OR IGNORE INTO existencias (producto, almacen, cantidad)
+        SELECT id, almacen, cantidad FROM productos WHERE almacen IS NOT NULL
+        """
+    )
+    c.execute(
+        "INSERT INTO cortes_existencias (fecha_hora, ultimo_movimiento) VALUES (?, 0)",
+        (now,),
+    )
+    c.execute(
+        """
+        INSERT INTO existencias_corte (corte, producto, almacen, cantidad)
+        SELECT ?, producto, almacen, cantidad FROM existencias
+        """,
+        (c.lastrowid,),
+    )
+
+
+# Columnas que se copian al historial, por tabla
+HISTORY_COLUMNS = {
+    "productos": (
+        "id", "nombre", "departamento", "precio", "cantidad", "almacen",
+        "fecha_hora_creacion", "fecha_hora_ultima_modificacion", "ultimo_usuario_en_modificar",
+    ),
+    "almacenes": (
+        "id", "nombre",
+        "fecha_hora_creacion", "fecha_hora_ultima_modificacion", "ultimo_usuario_en_modificar",
+    ),
+}
+
+
+AUDIT_COLUMNS = (
+    "fecha_hora_creacion", "fecha_hora_ultima_modificacion", "ultimo_usuario_en_modificar",
+)
+
+
+def _json_row(table: str, alias: str) -> str:
+    return "json_object(" + ", ".join(
+        f"'{column}', {alias}.{column}" for column in HISTORY_COLUMNS[table]
+    ) + ")"
+
+
+def _data_changed(table: str) -> str:
+    return " OR ".join(
+        f"old.{column} IS NOT new.{column}"
+        for column in HISTORY_COLUMNS[table] if column not in AUDIT_COLUMNS
+    )
+
+
+def create_history_triggers(c: sqlite3.Cursor) -> None:
+    """
+    Un trigger por operación y tabla que guarda en historial la fila antes
+    y después del cambio como JSON. La fecha usa el mismo formato local
+    que las columnas de auditoría. Un UPDATE que solo toca las columnas de
+    auditoría no se registra; así delete_product puede anotar quién borra
+    antes del DELETE. historial no acepta UPDATE ni DELETE.
+    """
+    now = "strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')"
+    for table in HISTORY_COLUMNS:
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_historial_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO historial (tabla, fila, operacion, fecha_hora, usuario, antes, despues)
+                VALUES ('{table}', new.id, 'INSERT', {now}, new.ultimo_usuario_en_modificar,
+                        NULL, {_json_row(table, "new")});
+            END
+            """
+        )
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_historial_au AFTER UPDATE ON {table}
+            WHEN {_data_changed(table)}
+            BEGIN
+                INSERT INTO historial (tabla, fila, operacion, fecha_hora, usuario, antes, despues)
+                VALUES ('{table}', new.id, 'UPDATE', {now}, new.ultimo_usuario_en_modificar,
+                        {_json_row(table, "old")}, {_json_row(table, "new")});
+            END
+            """
+        )
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_historial_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO historial (tabla, fila, operacion, fecha_hora, usuario, antes, despues)
+                VALUES ('{table}', old.id, 'DELETE', {now}, old.ultimo_usuario_en_modificar,
+                        {_json_row(table, "old")}, NULL);
+            END
+            """
+        )
+
+
+def _007_change_history(c: sqlite3.Cursor) -> None:
+    """
+    historial: solo se le agregan filas, con la imagen completa de la fila
+    antes y después de cada INSERT/UPDATE/DELETE en productos y almacenes.
+    """
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS historial (
+            id INTEGER PRIMARY KEY,
+            tabla TEXT NOT NULL,
+            fila INTEGER NOT NULL,
+            operacion TEXT NOT NULL,
+            fecha_hora TEXT NOT NULL,
+            usuario TEXT,
+            antes TEXT,
+            despues TEXT
+        )
+        """
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_historial_fila ON historial(tabla, fila, id)")
+    for operation in ("UPDATE", "DELETE"):
+        c.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS historial_sin_{operation.lower()}
+            BEFORE {operation} ON historial BEGIN
+                SELECT RAISE(ABORT, 'historial solo admite INSERT');
+            END
+            """
+        )
+    create_history_triggers(c)
+
+    # Un upsert masivo "actualiza" nombre y departamento aunque no cambien;
+    # sin el WHEN cada fila reescribía su entrada del índice de texto, que
+    # costaba más que el propio historial.
+    if _table_exists(c, "productos_fts"):
+        c.execute("DROP TRIGGER IF EXISTS productos_fts_au")
+        create_fulltext_triggers(c)
+
+
+# Existencias a partir de las cuales un producto cuenta como "bajo" en el
+# resumen; está dentro de los triggers, cambiarlo requiere un paso nuevo.
+LOW_STOCK_THRESHOLD = 5
+
+
+def _summary_delta(alias: str, sign: str) -> str:
+    """Sentencia que suma (sign="+") o resta la fila alias al resumen."""
+    return f"""
+        INSERT INTO resumen_almacenes (almacen, productos, valor_centavos, bajo_existencias)
+        VALUES (COALESCE({alias}.almacen, 0), {sign}1,
+                {sign}CAST(ROUND({alias}.precio * {alias}.cantidad * 100) AS INTEGER),
+                {sign}({alias}.cantidad <= {LOW_STOCK_THRESHOLD}))
+        ON CONFLICT(almacen) DO UPDATE SET
+            productos = productos + excluded.productos,
+            valor_centavos = valor_centavos + excluded.valor_centavos,
+            bajo_existencias = bajo_existencias + excluded.bajo_existencias;
+    """
+
+
+def create_summary_triggers(c: sqlite3.Cursor) -> None:
+    """
+    Mantienen resumen_almacenes al día con cada INSERT/UPDATE/DELETE en
+    productos: la fila vieja se resta y la nueva se suma a su almacén. Un
+    UPDATE que no toca almacén, precio ni cantidad no hace nada.
+    """
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS productos_resumen_ai AFTER INSERT ON productos BEGIN
+            {_summary_delta("new", "+")}
+        END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS productos_resumen_au AFTER UPDATE ON productos
+        WHEN old.almacen IS NOT new.almacen
+          OR old.precio IS NOT new.precio
+          OR old.cantidad IS NOT new.cantidad
+        BEGIN
+            {_summary_delta("old", "-")}
+            {_summary_delta("new", "+")}
+        END
+        """
+    )
+    c.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS productos_resumen_ad AFTER DELETE ON productos BEGIN
+            {_summary_delta("old", "-")}
+        END
+        """
+    )
+
+
+def rebuild_summary(c: sqlite3.Cursor) -> None:
+    """Recalcula resumen_almacenes desde productos (GROUP BY sobre idx_productos_almacen)."""
+    c.execute("DELETE FROM resumen_almacenes")
+    c.execute(
+        f"""
+        INSERT INTO resumen_almacenes (almacen, productos, valor_centavos, bajo_existencias)
+        SELECT COALESCE(almacen, 0), COUNT(*),
+               SUM(CAST(ROUND(precio * cantidad * 100) AS INTEGER)),
+               SUM(cantidad <= {LOW_STOCK_THRESHOLD})
+        FROM productos
+        GROUP BY almacen
+        """
+    )
+
+
+def _008_warehouse_summary(c: sqlite3.Cursor) -> None:
+    """
+    resumen_almacenes: una fila por almacén (0 = sin almacén) con número de
+    productos, valor del inventario en centavos (entero, para que sumar y
+    restar no acumule error) y productos con pocas existencias. La pantalla
+    de inicio lee esta tabla en lugar de recorrer productos.
+    """
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resumen_almacenes (
+            almacen INTEGER PRIMARY KEY,
+            productos INTEGER NOT NULL DEFAULT 0,
+            valor_centavos INTEGER NOT NULL DEFAULT 0,
+            bajo_existencias INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # "modificados recientemente" en orden de fecha sin recorrer la tabla
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_productos_modificacion "
+        "ON productos(fecha_hora_ultima_modificacion, id)"
+    )
+    rebuild_summary(c)
+    create_summary_triggers(c)
+
+
+def _009_warehouse_foreign_key(c: sqlite3.Cursor) -> None:
+    """
+    productos.almacen pasa a ser llave foránea de almacenes(id). SQLite no
+    agrega restricciones con ALTER TABLE: se crea la tabla nueva, se copian
+    las filas y se reemplaza la vieja, con sus índices y triggers. Los
+    productos cuyo almacén ya no existe quedan sin almacén (NULL) antes de
+    copiar; ese cambio pasa por los triggers de historial y resumen.
+    Borrar un almacén con productos lo resuelve Database.delete_warehouse
+    según DatabaseConfig.warehouse_delete_policy; aquí la llave solo lo
+    impide (RESTRICT).
+    """
+    c.execute(
+        """
+        UPDATE productos SET almacen = NULL
+        WHERE almacen IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM almacenes a WHERE a.id = productos.almacen)
+        """
+    )
+    c.execute(
+        "SELECT sql FROM sqlite_master "
+        "WHERE type = 'index' AND tbl_name = 'productos' AND sql IS NOT NULL"
+    )
+    indexes = [row[0] for row in c.fetchall()]
+
+    columns = ", ".join(HISTORY_COLUMNS["productos"])
+    c.execute(
+        """
+        CREATE TABLE productos_nueva (
+            id INTEGER NOT NULL,
+            nombre TEXT NOT NULL,
+            precio REAL NOT NULL,
+            cantidad INTEGER NOT NULL,
+            departamento TEXT NOT NULL,
+            almacen INTEGER REFERENCES almacenes(id) ON DELETE RESTRICT,
+            fecha_hora_creacion TEXT,
+            fecha_hora_ultima_modificacion TEXT,
+            ultimo_usuario_en_modificar TEXT,
+            PRIMARY KEY (id)
+        )
+        """
+    )
+    c.execute(f"INSERT INTO productos_nueva ({columns}) SELECT {columns} FROM productos")
+    # se lleva también índices y triggers de la tabla vieja
+    c.execute("DROP TABLE productos")
+    c.execute("ALTER TABLE productos_nueva RENAME TO productos")
+
+    for sql in indexes:
+        c.execute(sql)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_productos_almacen ON productos(almacen)")
+    if _table_exists(c, "productos_fts"):
+        create_fulltext_triggers(c)
+    create_history_triggers(c)
+    create_summary_triggers(c)
+
+    # el saldo de un almacén, sin recorrer existencias completa
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_existencias_almacen ON existencias(almacen, cantidad)"
+    )
+
+    # los almacenes que quedaron sin productos
+    c.execute("DELETE FROM resumen_almacenes WHERE productos = 0")
+
+    c.execute("PRAGMA foreign_key_check(productos)")
+    if c.fetchone() is not None:
+        raise sqlite3.IntegrityError("productos tiene almacenes inexistentes")
+
+
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Cursor], None]]] = [
+    (1, _001_base_tables),
+    (2, _002_audit_columns),
+    (3, _003_product_indexes),
+    (4, _004_fulltext_index),
+    (5, _005_sort_indexes),
+    (6, _006_stock_ledger),
+    (7, _007_change_history),
+    (8, _008_warehouse_summary),
+    (9, _009_warehouse_foreign_key),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Aplica los pasos pendientes y regresa la versión final del esquema.
+    Mientras corren se apagan las llaves foráneas (solo se puede fuera de
+    una transacción): reconstruir una tabla la borra y la vuelve a crear.
+
+    La base puede estar en una carpeta compartida: si dos instancias abren
+    un esquema viejo al mismo tiempo, cada paso toma el candado de
+    escritura (BEGIN IMMEDIATE) y vuelve a leer la versión ya dentro de la
+    transacción; si otra instancia lo aplicó mientras tanto, se salta.
+    """
+    current = schema_version(conn)
+    if current >= LATEST_VERSION:
+        return current
+
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for version, step in MIGRATIONS:
+            if version <= current:
+                continue
+
+            c = conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                current = schema_version(conn)
+                if version > current:
+                    step(c)
+                    c.execute(f"PRAGMA user_version = {version}")
+                    current = version
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {int(foreign_keys)}")
+    return current
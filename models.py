@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 
@@ -10,7 +10,8 @@ class User:
     last_login: Optional[str]
 
 
-@dataclass
+# slots + frozen: sin __dict__ por instancia, importante en listados grandes
+@dataclass(frozen=True, slots=True)
 class Product:
     id: int
     name: str
@@ -19,10 +20,76 @@ class Product:
     stock: int
     last_modified: Optional[str]
     warehouse_name: Optional[str] = None
+    created_at: Optional[str] = None
+    last_modified_by: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Warehouse:
     id: int
     name: str
     last_modified: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class StockMovement:
+    id: int
+    product_id: int
+    warehouse_id: int
+    kind: str                 # ENTRADA, SALIDA, TRASPASO o AJUSTE
+    quantity: int             # con signo: lo que cambió el saldo del almacén
+    username: Optional[str]
+    timestamp: str
+    note: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryEntry:
+    id: int
+    table: str                # "productos" o "almacenes"
+    row_id: int
+    op: str                   # INSERT, UPDATE o DELETE
+    timestamp: str
+    username: Optional[str]
+    before: Optional[dict]    # fila antes del cambio (None en INSERT)
+    after: Optional[dict]     # fila después del cambio (None en DELETE)
+
+
+@dataclass(frozen=True)
+class WarehouseCatalog:
+    warehouses: tuple          # Warehouse ordenados por id
+    id_to_name: dict
+    name_to_id: dict
+
+
+@dataclass(frozen=True, slots=True)
+class WarehouseSummary:
+    warehouse_id: Optional[int]   # None: productos sin almacén
+    warehouse_name: Optional[str]
+    products: int
+    value: float
+    low_stock: int
+
+
+@dataclass(frozen=True)
+class Dashboard:
+    total_value: float
+    total_products: int
+    total_low_stock: int
+    warehouses: tuple          # WarehouseSummary, de mayor a menor valor
+    low_stock: list            # Product con menos existencias
+    recent: list               # Product modificados más recientemente
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    rejected: list = field(default_factory=list)  # (línea, motivo)
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    table: str                # "productos" o "almacenes"
+    op: str                   # "insert", "update", "delete" o "bulk"
+    row_id: Optional[int] = None
+    row_ids: tuple = ()       # ediciones masivas: todos los ids afectados
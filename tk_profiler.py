@@ -0,0 +1,282 @@
+import atexit
+import collections
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import tkinter
+import tkinter.commondialog
+from typing import Optional
+
+from database import Database, instrumentable_methods, synchronized
+from instrumentation import instrumented, percentile
+
+# ------------------------------------------------------------------
+#  PERFILADOR DE LA INTERFAZ (opcional)
+# ------------------------------------------------------------------
+#
+# Mide cuánto bloquea el ciclo de Tk cada callback (comandos, bindings y
+# trabajos de after(): todos pasan por tkinter.CallWrapper). De ese tiempo:
+#   - base de datos: exacto, lo que tardan los métodos de Database llamados
+#     desde el hilo de Tk;
+#   - widgets: estimado por muestreo, la fracción de muestras dentro de
+#     tkinter (llamadas a Tcl como Treeview.insert);
+#   - Python: el resto.
+# Un hilo toma una muestra de la pila del hilo de Tk cada INTERVAL_MS
+# mientras corre un callback; al salir se escriben las pilas en formato
+# "collapsed" (flamegraph.pl, speedscope) y un resumen por callback.
+
+INTERVAL_MS = 1.0
+SAMPLES = 1000
+# ventanas modales, esperas y ciclos anidados (LoginWindow._on_login corre
+# el mainloop de la ventana principal): Tk sigue atendiendo eventos, no
+# cuenta como bloqueo del callback que los abrió
+_PAUSES = (
+    (tkinter.Misc, "mainloop"),
+    (tkinter.Misc, "wait_window"),
+    (tkinter.Misc, "wait_variable"),
+    (tkinter.Misc, "wait_visibility"),
+    (tkinter.Misc, "update"),
+    (tkinter.commondialog.Dialog, "show"),
+)
+
+
+def callback_name(func) -> str:
+    """Nombre legible del callback; los de after() se desenvuelven."""
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "callit" and func.__closure__:
+        cells = dict(zip(code.co_freevars, (c.cell_contents for c in func.__closure__)))
+        if "func" in cells:
+            return "after:" + callback_name(cells["func"])
+    target = getattr(func, "__func__", func)
+    name = getattr(target, "__qualname__", None) or type(func).__name__
+    if isinstance(func, functools.partial):
+        name = callback_name(func.func)
+    return name
+
+
+def _frame_name(code) -> str:
+    path, module = os.path.split(os.path.splitext(code.co_filename)[0])
+    if module == "__init__":
+        module = os.path.basename(path)
+    # co_qualname es de Python 3.11; en 3.10 solo está el nombre corto
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class _Active:
+    __slots__ = ("name", "start", "paused_ms", "pause_start", "db_ms", "db_depth")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.paused_ms = 0.0
+        self.pause_start: Optional[float] = None
+        self.db_ms = 0.0
+        self.db_depth = 0
+
+
+class _CallbackStats:
+    __slots__ = ("calls", "blocked_ms", "max_ms", "db_ms", "samples", "category_samples")
+
+    def __init__(self):
+        self.calls = 0
+        self.blocked_ms = 0.0
+        self.max_ms = 0.0
+        self.db_ms = 0.0
+        self.samples = collections.deque(maxlen=SAMPLES)
+        self.category_samples = collections.Counter()
+
+
+class TkProfiler:
+    def __init__(self, output: str, interval_ms: float = INTERVAL_MS):
+        self.output = output
+        self.interval = interval_ms / 1000
+        self.main_thread = threading.get_ident()
+        self._stack: list = []
+        self._stats = collections.defaultdict(_CallbackStats)
+        self._stacks = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._installed = False
+        self._call_code = None
+        # envoltorios (de aquí, de instrumentation y @synchronized) que no
+        # aportan nada a las pilas
+        self._skip_codes = {
+            instrumented(lambda self: None).__code__,
+            synchronized(lambda self: None).__code__,
+        }
+
+    # --------- INSTALACIÓN ---------
+
+    def install(self) -> None:
+        """Parcha tkinter y Database; los datos se escriben al salir."""
+        if self._installed:
+            return
+        self._installed = True
+
+        profiler = self
+        original_call = tkinter.CallWrapper.__call__
+
+        def __call__(wrapper, *args):
+            return profiler._run_callback(original_call, wrapper, args)
+
+        self._skip_codes.add(__call__.__code__)
+        self._skip_codes.add(self._run_callback.__code__)
+
+        # la pila de cada muestra empieza debajo del CallWrapper original
+        self._call_code = original_call.__code__
+        tkinter.CallWrapper.__call__ = __call__
+
+        for cls, name in _PAUSES:
+            setattr(cls, name, self._pausing(getattr(cls, name)))
+        for name, method in instrumentable_methods():
+            # a un generador solo se le mediría crearlo, no recorrerlo
+            if not inspect.isgeneratorfunction(inspect.unwrap(method)):
+                setattr(Database, name, self._db_timed(method))
+
+        # con el intervalo por omisión (5 ms) el muestreador casi nunca
+        # obtiene el GIL mientras el hilo de Tk corre Python
+        sys.setswitchinterval(self.interval)
+        threading.Thread(target=self._sample_loop, name="TkProfiler", daemon=True).start()
+        atexit.register(self.write)
+
+    def _run_callback(self, original_call, wrapper, args):
+        if threading.get_ident() != self.main_thread:
+            return original_call(wrapper, *args)
+        active = _Active(callback_name(wrapper.func))
+        self._stack.append(active)
+        try:
+            return original_call(wrapper, *args)
+        finally:
+            self._stack.pop()
+            blocked = (time.perf_counter() - active.start) * 1000 - active.paused_ms
+            with self._lock:
+                stats = self._stats[active.name]
+                stats.calls += 1
+                stats.blocked_ms += blocked
+                stats.max_ms = max(stats.max_ms, blocked)
+                stats.db_ms += active.db_ms
+                stats.samples.append(blocked)
+
+    def _pausing(self, method):
+        profiler = self
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            stack = profiler._stack
+            if not stack or threading.get_ident() != profiler.main_thread:
+                return method(*args, **kwargs)
+            active = stack[-1]
+            if active.pause_start is not None:
+                return method(*args, **kwargs)
+            active.pause_start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                active.paused_ms += (time.perf_counter() - active.pause_start) * 1000
+                active.pause_start = None
+
+        self._skip_codes.add(wrapper.__code__)
+        return wrapper
+
+    def _db_timed(self, method):
+        profiler = self
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            stack = profiler._stack
+            if not stack or threading.get_ident() != profiler.main_thread:
+                return method(*args, **kwargs)
+            active = stack[-1]
+            active.db_depth += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                active.db_depth -= 1
+                if active.db_depth == 0:
+                    active.db_ms += (time.perf_counter() - start) * 1000
+
+        self._skip_codes.add(wrapper.__code__)
+        return wrapper
+
+    # --------- MUESTREO ---------
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            # el hilo de Tk puede sacar el callback entre la revisión y la lectura
+            try:
+                active = self._stack[-1]
+            except IndexError:
+                continue
+            if active.pause_start is not None:
+                continue
+            frame = sys._current_frames().get(self.main_thread)
+            if frame is not None:
+                self._record_sample(active.name, frame)
+
+    def _record_sample(self, name: str, frame) -> None:
+        names = []
+        category = "python"
+        while frame is not None and frame.f_code is not self._call_code:
+            code = frame.f_code
+            frame = frame.f_back
+            if code in self._skip_codes:
+                continue
+            names.append(_frame_name(code))
+            if category == "python" and code.co_filename == tkinter.__file__:
+                category = "widgets"
+            if os.path.basename(code.co_filename) == "database.py":
+                category = "db"
+        names.append(name)
+        names.reverse()
+        with self._lock:
+            self._stacks[";".join(names)] += 1
+            self._stats[name].category_samples[category] += 1
+
+    # --------- RESULTADOS ---------
+
+    def summary(self) -> list:
+        """Por callback: llamadas, bloqueo total/máx/p95 y su reparto."""
+        rows = []
+        with self._lock:
+            for name, stats in self._stats.items():
+                categories = stats.category_samples
+                sampled = sum(categories.values())
+                widgets_ms = stats.blocked_ms * categories["widgets"] / sampled if sampled else 0.0
+                rows.append(
+                    {
+                        "callback": name,
+                        "calls": stats.calls,
+                        "blocked_ms": stats.blocked_ms,
+                        "max_ms": stats.max_ms,
+                        "p95_ms": percentile(sorted(stats.samples), 95),
+                        "db_ms": stats.db_ms,
+                        "widgets_ms": widgets_ms,
+                        "python_ms": max(0.0, stats.blocked_ms - stats.db_ms - widgets_ms),
+                    }
+                )
+        return sorted(rows, key=lambda r: r["blocked_ms"], reverse=True)
+
+    def write(self) -> None:
+        """Escribe output (pilas collapsed) y output + ".resumen.txt"."""
+        self._stop.set()
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        with open(self.output, "w", encoding="utf-8") as f:
+            for stack, count in stacks:
+                f.write(f"{stack} {count}\n")
+
+        with open(self.output + ".resumen.txt", "w", encoding="utf-8") as f:
+            f.write(
+                f"{'callback':60s} {'llamadas':>8s} {'bloqueo':>10s} {'máx':>9s} "
+                f"{'p95':>9s} {'base':>10s} {'widgets':>10s} {'python':>10s}\n"
+            )
+            for r in self.summary():
+                f.write(
+                    f"{r['callback'][:60]:60s} {r['calls']:8d} {r['blocked_ms']:8.1f}ms "
+                    f"{r['max_ms']:7.1f}ms {r['p95_ms']:7.1f}ms {r['db_ms']:8.1f}ms "
+                    f"{r['widgets_ms']:8.1f}ms {r['python_ms']:8.1f}ms\n"
+                )
@@ -1,9 +1,16 @@
+import bisect
+import functools
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+from typing import Optional
 
-from database import Database
-from models import User
-from PIL import Image, ImageTk
+import exporter
+import importer
+from database import Database, product_cursor, warehouse_cursor
+from db_worker import DatabaseWorker
+from models import ImportResult, User, WarehouseCatalog
+
+LOGO_PATH = "logo.png"
 
 def center_window(window, width, height):
     window.update_idletasks()
@@ -16,6 +23,329 @@ def center_window(window, width, height):
     window.geometry(f"{width}x{height}+{x}+{y}")
 
 
+@functools.lru_cache(maxsize=None)
+def _logo_source():
+    """
+    logo.png decodificado una sola vez por proceso. Pillow se importa aquí
+    y no al cargar el módulo: es lo más lento del arranque.
+    """
+    from PIL import Image
+
+    with Image.open(LOGO_PATH) as img:
+        img.load()
+        return img.copy()
+
+
+@functools.lru_cache(maxsize=None)
+def _scaled_logo(max_width: int, max_height: Optional[int]):
+    img = _logo_source()
+    w, h = img.size
+    ratio = min(1, max_width / w, (max_height or h) / h)
+    if ratio < 1:
+        img = img.resize((int(w * ratio), int(h * ratio)))
+    return img
+
+
+def load_logo(max_width: int, max_height: Optional[int] = None):
+    """
+    PhotoImage del logo reducido para caber en max_width x max_height, o
+    None si no se puede leer. La imagen escalada queda en caché; el
+    PhotoImage se crea cada vez porque pertenece a una ventana Tk.
+    """
+    try:
+        from PIL import ImageTk
+
+        return ImageTk.PhotoImage(_scaled_logo(max_width, max_height))
+    except Exception:
+        return None
+
+
+def ask_import_file(parent, title):
+    return filedialog.askopenfilename(
+        parent=parent,
+        title=title,
+        filetypes=[("CSV o Excel", "*.csv *.xlsx"), ("Todos los archivos", "*.*")],
+    )
+
+
+def sort_heading(text: str, active: bool, descending: bool) -> str:
+    if not active:
+        return text
+    return f"{text} {'▼' if descending else '▲'}"
+
+
+def show_import_result(result: ImportResult, max_lines: int = 10):
+    message = f"Filas importadas: {result.imported}\nFilas rechazadas: {len(result.rejected)}"
+    if result.rejected:
+        details = "\n".join(f"Línea {line}: {reason}" for line, reason in result.rejected[:max_lines])
+        if len(result.rejected) > max_lines:
+            details += "\n..."
+        message += "\n\n" + details
+        messagebox.showwarning("Importación", message)
+    else:
+        messagebox.showinfo("Importación", message)
+
+
+# ==============================
+#  TABLA PAGINADA (VIRTUAL)
+# ==============================
+
+class PagedTreeview(ttk.Frame):
+    """
+    Treeview que solo mantiene en Tcl una ventana de filas (unas cuantas
+    páginas) y va pidiendo más a la base de datos conforme se hace scroll,
+    usando paginación por llave (cursor > último / cursor < primero).
+
+    fetch_page(callback, after=..., before=..., limit=...) debe pedir la
+    página (normalmente a través de DatabaseWorker) y llamar callback(rows)
+    con objetos que tengan atributo id, en el orden de la tabla;
+    row_values(obj) da los valores de la fila y sort_key(obj) su cursor,
+    comparable igual que el ORDER BY de la consulta (por omisión (id,)).
+    """
+
+    def __init__(self, parent, columns, fetch_page, row_values,
+                 page_size: int = 100, max_pages: int = 3, sort_key=None, **tree_kwargs):
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.row_values = row_values
+        self.sort_key = sort_key or (lambda obj: (obj.id,))
+        self.descending = False
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", **tree_kwargs)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        # iid -> cursor de cada fila cargada
+        self._cursors = {}
+        self._at_start = True
+        self._at_end = True
+        self._loading = False
+
+    # --------- VENTANA DE FILAS ---------
+
+    def reset(self):
+        """
+        Descarta la ventana actual y carga solo la primera página.
+        """
+        self._loading = True
+        self.fetch_page(self._on_first_page, limit=self.page_size)
+
+    def set_order(self, sort_key, descending: bool = False):
+        """
+        Cambia el cursor de las filas (y la dirección) y vuelve a la primera
+        página; la consulta de fetch_page debe usar el mismo orden.
+        """
+        self.sort_key = sort_key
+        self.descending = descending
+        self.reset()
+
+    def _on_first_page(self, rows):
+        self._loading = False
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._cursors.clear()
+        self._insert_rows(rows, "end")
+        self._at_start = True
+        self._at_end = len(rows) < self.page_size
+        self.tree.yview_moveto(0)
+        self.after_idle(self._check_viewport)
+
+    def _insert_rows(self, rows, index):
+        if index == 0:
+            rows = reversed(rows)
+        for obj in rows:
+            iid = str(obj.id)
+            self.tree.insert("", index, iid=iid, values=self.row_values(obj))
+            self._cursors[iid] = self.sort_key(obj)
+
+    def _delete_rows(self, iids):
+        self.tree.delete(*iids)
+        for iid in iids:
+            self._cursors.pop(iid, None)
+
+    def _load_next(self):
+        children = self.tree.get_children()
+        if not children:
+            self._loading = False
+            return
+        self.fetch_page(
+            self._on_next_page, after=self._cursors[children[-1]], limit=self.page_size
+        )
+
+    def _on_next_page(self, rows):
+        self._loading = False
+        self._at_end = len(rows) < self.page_size
+        if not rows:
+            return
+        self._insert_rows(rows, "end")
+
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            self._delete_rows(children[:excess])
+            self._at_start = False
+            self.tree.see(str(rows[0].id))
+
+    def _load_previous(self):
+        children = self.tree.get_children()
+        if not children:
+            self._loading = False
+            return
+        self.fetch_page(
+            self._on_previous_page, before=self._cursors[children[0]], limit=self.page_size
+        )
+
+    def _on_previous_page(self, rows):
+        self._loading = False
+        self._at_start = len(rows) < self.page_size
+        if not rows:
+            return
+        self._insert_rows(rows, 0)
+
+        children = self.tree.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            self._delete_rows(children[-excess:])
+            self._at_end = False
+        self.tree.yview_moveto(len(rows) / len(self.tree.get_children()))
+
+    def _on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._fill_viewport(first, last)
+
+    def _fill_viewport(self, first, last):
+        if self._loading:
+            return
+        if float(last) >= 0.98 and not self._at_end:
+            self._loading = True
+            self.after_idle(self._load_next)
+        elif float(first) <= 0.02 and not self._at_start:
+            self._loading = True
+            self.after_idle(self._load_previous)
+
+    def _check_viewport(self):
+        """
+        Las cargas de la ventana (reset, reload_window, refresh) reemplazan
+        en el worker a un _load_next/_load_previous pendiente, que ya no
+        llega; al terminar se revisa si la vista sigue pegada a un borde y
+        le faltan filas. Cambiar solo valores no dispara yscrollcommand.
+        """
+        if self.tree.winfo_exists():
+            self._fill_viewport(*self.tree.yview())
+
+    # --------- CAMBIOS PUNTUALES ---------
+
+    def upsert_row(self, obj):
+        """
+        Actualiza la fila si ya está en la ventana (moviéndola si cambió su
+        lugar en el orden); si no, la inserta en su posición siempre que
+        caiga dentro de la ventana cargada.
+        """
+        iid = str(obj.id)
+        key = self.sort_key(obj)
+        if self.tree.exists(iid):
+            if self._cursors.get(iid) == key:
+                self.tree.item(iid, values=self.row_values(obj))
+                return
+            self._delete_rows([iid])
+
+        # los cursores se comparan siempre en orden ascendente
+        keys = [self._cursors[i] for i in self.tree.get_children()]
+        if self.descending:
+            keys.reverse()
+        at_low, at_high = self._at_start, self._at_end
+        if self.descending:
+            at_low, at_high = at_high, at_low
+        if keys and key < keys[0] and not at_low:
+            return
+        if keys and key > keys[-1] and not at_high:
+            return
+
+        index = bisect.bisect_left(keys, key)
+        if self.descending:
+            index = len(keys) - index
+        self.tree.insert("", index, iid=iid, values=self.row_values(obj))
+        self._cursors[iid] = key
+
+    def remove_row(self, row_id):
+        iid = str(row_id)
+        if self.tree.exists(iid):
+            self._delete_rows([iid])
+
+    def reload_window(self):
+        """
+        Vuelve a leer las filas de la ventana actual sin mover el scroll
+        ni perder la selección.
+        """
+        children = self.tree.get_children()
+        if not children:
+            self.reset()
+            return
+        # el id es entero: (valor, id - 1) es el cursor justo antes de la
+        # primera fila (id + 1 si el orden es descendente)
+        first = self._cursors[children[0]]
+        step = 1 if self.descending else -1
+        self._loading = True
+        self.fetch_page(
+            self._on_window_reloaded,
+            after=first[:-1] + (first[-1] + step,),
+            limit=len(children),
+        )
+
+    def _on_window_reloaded(self, rows):
+        self._loading = False
+        for obj in rows:
+            iid = str(obj.id)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=self.row_values(obj))
+                self._cursors[iid] = self.sort_key(obj)
+        self.after_idle(self._check_viewport)
+
+    def refresh(self):
+        """
+        Después de cambios masivos: vuelve a leer la ventana desde su primera
+        fila con el filtro y orden actuales (aparecen altas, desaparecen
+        bajas) y conserva el scroll y la selección de las filas que sigan.
+        """
+        children = self.tree.get_children()
+        if not children:
+            self.reset()
+            return
+        first = self._cursors[children[0]]
+        step = 1 if self.descending else -1
+        selection = self.tree.selection()
+        position = self.tree.yview()[0]
+        limit = max(len(children), self.page_size)
+        self._loading = True
+        self.fetch_page(
+            lambda rows: self._on_refreshed(rows, limit, selection, position),
+            after=first[:-1] + (first[-1] + step,),
+            limit=limit,
+        )
+
+    def _on_refreshed(self, rows, limit, selection, position):
+        if not rows:
+            # la ventana quedó vacía: se vuelve al principio
+            self.reset()
+            return
+        self._loading = False
+        self.tree.delete(*self.tree.get_children())
+        self._cursors.clear()
+        self._insert_rows(rows, "end")
+        self._at_end = len(rows) < limit
+        kept = [iid for iid in selection if self.tree.exists(iid)]
+        if kept:
+            self.tree.selection_set(kept)
+        self.tree.yview_moveto(position)
+        self.after_idle(self._check_viewport)
+
+
 # ==============================
 #  VENTANA DE LOGIN BONITA
 # ==============================
@@ -50,16 +380,10 @@ class LoginWindow(tk.Tk):
         content.place(relx=0.5, rely=0.5, anchor="center")
 
         # ---------- LOGO ARRIBA ----------
-        try:
-            img = Image.open("logo.png")
-            w, h = img.size
-            max_w = 850
-            if w > max_w:
-                ratio = max_w / w
-                img = img.resize((int(w * ratio), int(h * ratio)))
-            self.logo_img = ImageTk.PhotoImage(img)
+        self.logo_img = load_logo(850)
+        if self.logo_img:
             tk.Label(content, image=self.logo_img, bg="white").pack(pady=(0, 20))
-        except Exception:
+        else:
             tk.Label(
                 content,
                 text="SISTEMA DE INVENTARIO",
@@ -134,6 +458,10 @@ class MainWindow(tk.Tk):
         center_window(self, 900, 550)
 
         self.current_view = None
+        self.worker = DatabaseWorker(self, self.db)
+        # las vistas se construyen la primera vez que se muestran: Productos
+        # y Almacenes cargan su tabla al construirse
+        self._views = {}
         self._build_widgets()
 
     def _build_widgets(self):
@@ -153,9 +481,13 @@ class MainWindow(tk.Tk):
         self.content_frame = tk.Frame(card, bg="white")
         self.content_frame.pack(fill="both", expand=True, pady=(20, 10), padx=20)
 
-        self.home_view = HomeView(self.content_frame)
-        self.products_view = ProductsView(self.content_frame, self.db, self.user)
-        self.warehouses_view = WarehousesView(self.content_frame, self.db, self.user)
+        self._view_factories = {
+            "home": lambda: HomeView(self.content_frame, self.db, self.worker),
+            "products": lambda: ProductsView(self.content_frame, self.db, self.user, self.worker),
+            "warehouses": lambda: WarehousesView(
+                self.content_frame, self.db, self.user, self.worker
+            ),
+        }
 
         btn_frame = tk.Frame(card, bg="white")
         btn_frame.pack(side="bottom", pady=20)
@@ -181,11 +513,16 @@ class MainWindow(tk.Tk):
         tk.Button(btn_frame, text="Inicio", command=self.show_home, **btn_style).pack(side="left", padx=8)
         tk.Button(btn_frame, text="Productos", command=self.show_products, **btn_style).pack(side="left", padx=8)
         tk.Button(btn_frame, text="Almacenes", command=self.show_warehouses, **btn_style).pack(side="left", padx=8)
+        if self.user.role == "ADMIN":
+            tk.Button(
+                btn_frame, text="Diagnóstico", command=self.show_diagnostics, **btn_style
+            ).pack(side="left", padx=8)
         tk.Button(logout_frame,text="Cerrar sesión",command=self.logout,**btn_style).pack(side="right", padx=8)
 
         self.show_home()
 
     def logout(self):
+        self.worker.stop()
         self.destroy()
         login = LoginWindow(self.db)
         login.mainloop()
@@ -196,70 +533,185 @@ class MainWindow(tk.Tk):
         self.current_view = frame
         self.current_view.pack(fill="both", expand=True)
 
+    def _view(self, name: str):
+        view = self._views.get(name)
+        if view is None:
+            view = self._views[name] = self._view_factories[name]()
+        return view
+
     def show_home(self):
-        self._switch_view(self.home_view)
+        home = self._view("home")
+        self._switch_view(home)
+        home.refresh()
 
     def show_products(self):
-        self._switch_view(self.products_view)
+        self._switch_view(self._view("products"))
 
     def show_warehouses(self):
-        self._switch_view(self.warehouses_view)
+        self._switch_view(self._view("warehouses"))
+
+    def show_diagnostics(self):
+        DiagnosticsDialog(self, self.db)
 
 # ==============================
 #  VISTA: HOME
 # ==============================
 
 class HomeView(tk.Frame):
-    def __init__(self, parent):
+    """
+    Pantalla de inicio con los indicadores del inventario. Se recalcula al
+    mostrarse y, mientras está visible, poco después de cada cambio en la
+    base (Database.get_dashboard solo lee el resumen por almacén).
+    """
+
+    # espera tras un cambio antes de recalcular; agrupa ráfagas de avisos
+    REFRESH_DELAY_MS = 500
+    LIST_ROWS = 8
+
+    def __init__(self, parent, db: Database, worker: DatabaseWorker):
         super().__init__(parent, bg="white")
+        self.db = db
+        self.worker = worker
+        self._refresh_job = None
 
-        self.logo_img = None
-        try:
-            img = Image.open("logo.png")
-            w, h = img.size
+        self._build_widgets()
 
-            max_width = 600
-            if w > max_width:
-                ratio = max_width / w
-                new_size = (int(w * ratio), int(h * ratio))
-                img = img.resize(new_size)
+        self._unsubscribe = self.db.subscribe(
+            lambda event: self.worker.notify(self._on_db_change, event)
+        )
+        self.bind("<Destroy>", lambda e: self._unsubscribe())
 
-            self.logo_img = ImageTk.PhotoImage(img)
-        except Exception:
-            self.logo_img = None
+    def _build_widgets(self):
+        header = tk.Frame(self, bg="white")
+        header.pack(fill="x")
 
+        self.logo_img = load_logo(600, 90)
         if self.logo_img:
-            tk.Label(self, image=self.logo_img, bg="white").pack(pady=(10, 5))
+            tk.Label(header, image=self.logo_img, bg="white").pack(side="left", padx=(0, 15))
         else:
-            canvas = tk.Canvas(self, width=180, height=180, bg="white", highlightthickness=0)
-            canvas.pack(pady=(15, 5))
-            canvas.create_oval(10, 10, 170, 170, outline="#015294", width=2, fill="#e6f0fa")
-            canvas.create_text(90, 90, text="LOGO", fill="#015294", font=("Arial", 12, "bold"))
+            canvas = tk.Canvas(header, width=90, height=90, bg="white", highlightthickness=0)
+            canvas.pack(side="left", padx=(0, 15))
+            canvas.create_oval(5, 5, 85, 85, outline="#015294", width=2, fill="#e6f0fa")
+            canvas.create_text(45, 45, text="LOGO", fill="#015294", font=("Arial", 10, "bold"))
+
+        titles = tk.Frame(header, bg="white")
+        titles.pack(side="left", anchor="w")
 
         tk.Label(
-            self,
+            titles,
             text="SISTEMA DE INVENTARIO",
             bg="white",
             fg="#333333",
             font=("Arial", 16, "bold"),
-        ).pack(pady=(10, 2))
+        ).pack(anchor="w")
 
         tk.Label(
-            self,
+            titles,
             text="Autor: Dante Durand Morales",
             bg="white",
             fg="#666666",
             font=("Arial", 11),
-        ).pack(pady=(0, 10))
+        ).pack(anchor="w")
+
+        # --------- INDICADORES ---------
+
+        kpis = tk.Frame(self, bg="white")
+        kpis.pack(fill="x", pady=10)
+
+        self.kpi_labels = {}
+        for key, title in (
+                ("value", "Valor del inventario"),
+                ("products", "Productos"),
+                ("low_stock", f"Existencias bajas (≤ {Database.LOW_STOCK_THRESHOLD})"),
+        ):
+            box = tk.Frame(kpis, bg="#e6f0fa", padx=12, pady=6)
+            box.pack(side="left", expand=True, fill="x", padx=5)
+            tk.Label(box, text=title, bg="#e6f0fa", fg="#015294", font=("Arial", 10)).pack()
+            self.kpi_labels[key] = tk.Label(
+                box, text="-", bg="#e6f0fa", fg="#333333", font=("Arial", 15, "bold")
+            )
+            self.kpi_labels[key].pack()
 
-        tk.Label(
-            self,
-            text="Usa los botones de abajo para navegar entre\nInicio, Productos y Almacenes.",
-            bg="white",
-            fg="#555555",
-            font=("Arial", 10),
-            justify="center",
-        ).pack(pady=10)
+        # --------- TABLAS ---------
+
+        tables = tk.Frame(self, bg="white")
+        tables.pack(fill="both", expand=True)
+
+        self.warehouses_tree = self._table(
+            tables, "Por almacén",
+            (("almacen", "Almacén", 110), ("productos", "Productos", 70),
+             ("valor", "Valor", 100), ("bajo", "Bajos", 50)),
+        )
+        self.low_stock_tree = self._table(
+            tables, "Existencias bajas",
+            (("nombre", "Producto", 150), ("existencias", "Existencias", 70),
+             ("almacen", "Almacén", 90)),
+        )
+        self.recent_tree = self._table(
+            tables, "Modificados recientemente",
+            (("nombre", "Producto", 150), ("fecha", "Fecha", 130)),
+        )
+
+    def _table(self, parent, title, columns):
+        frame = ttk.LabelFrame(parent, text=title)
+        frame.pack(side="left", fill="both", expand=True, padx=5)
+        tree = ttk.Treeview(
+            frame, columns=[c[0] for c in columns], show="headings", height=self.LIST_ROWS
+        )
+        for col, heading, width in columns:
+            tree.heading(col, text=heading)
+            tree.column(col, width=width, anchor="w" if col == "nombre" else "center")
+        tree.pack(fill="both", expand=True)
+        return tree
+
+    # --------- DATOS ---------
+
+    def refresh(self):
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        self.worker.submit(
+            self.db.get_dashboard,
+            self.LIST_ROWS,
+            self.LIST_ROWS,
+            callback=self._show_dashboard,
+            key="dashboard",
+        )
+
+    def _on_db_change(self, event):
+        # oculta no se recalcula: show_home() lo hace al volver
+        if not self.winfo_ismapped() or self._refresh_job is not None:
+            return
+        self._refresh_job = self.after(self.REFRESH_DELAY_MS, self.refresh)
+
+    @staticmethod
+    def _fill(tree, rows):
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+        for values in rows:
+            tree.insert("", "end", values=values)
+
+    def _show_dashboard(self, dashboard):
+        self.kpi_labels["value"].config(text=f"${dashboard.total_value:,.2f}")
+        self.kpi_labels["products"].config(text=f"{dashboard.total_products:,}")
+        self.kpi_labels["low_stock"].config(text=f"{dashboard.total_low_stock:,}")
+
+        self._fill(
+            self.warehouses_tree,
+            (
+                (w.warehouse_name or "(sin almacén)", w.products, f"${w.value:,.2f}", w.low_stock)
+                for w in dashboard.warehouses
+            ),
+        )
+        self._fill(
+            self.low_stock_tree,
+            ((p.name, p.stock, p.warehouse_name or "") for p in dashboard.low_stock),
+        )
+        self._fill(
+            self.recent_tree,
+            ((p.name, p.last_modified or "-") for p in dashboard.recent),
+        )
 
 
 # ==============================
@@ -267,14 +719,48 @@ class HomeView(tk.Frame):
 # ==============================
 
 class ProductsView(ttk.Frame):
-    def __init__(self, parent, db: Database, user: User):
+    # columna de la tabla -> orden de Database.search_products
+    SORT_COLUMNS = {
+        "id": "id",
+        "nombre": "name",
+        "descripcion": "desc",
+        "precio": "price",
+        "existencias": "stock",
+    }
+
+    # espera desde la última tecla antes de lanzar la búsqueda rápida
+    SEARCH_DELAY_MS = 200
+    HISTORY_PAGE = 20
+    # (llave en el JSON del historial, etiqueta)
+    HISTORY_FIELDS = (
+        ("nombre", "Nombre"),
+        ("departamento", "Departamento"),
+        ("precio", "Precio"),
+        ("cantidad", "Cantidad"),
+        ("almacen", "Almacén"),
+    )
+    HISTORY_OPS = {"INSERT": "Alta", "UPDATE": "Modificación", "DELETE": "Baja"}
+
+    def __init__(self, parent, db: Database, user: User, worker: DatabaseWorker):
         super().__init__(parent)
         self.db = db
         self.user = user
+        self.worker = worker
+        self.filters = {}
+        self.order_by = "id"
+        self.descending = False
+        self._search_job = None
+        self._history_product = None
+        self._history_last_id = None
 
         self._build_widgets()
         self.refresh_table()
 
+        self._unsubscribe = self.db.subscribe(
+            lambda event: self.worker.notify(self._on_db_change, event)
+        )
+        self.bind("<Destroy>", lambda e: self._unsubscribe())
+
     def _build_widgets(self):
         top = ttk.Frame(self)
         top.pack(side="top", fill="x", pady=5)
@@ -285,27 +771,63 @@ class ProductsView(ttk.Frame):
         self.btn_add = ttk.Button(buttons_frame, text="Agregar", command=self.add_product)
         self.btn_edit = ttk.Button(buttons_frame, text="Modificar", command=self.edit_product)
         self.btn_delete = ttk.Button(buttons_frame, text="Eliminar", command=self.delete_product)
+        self.btn_bulk = ttk.Button(buttons_frame, text="Edición masiva", command=self.bulk_edit)
         self.btn_search = ttk.Button(buttons_frame, text="Buscar", command=self.open_search_dialog)
         self.btn_clear = ttk.Button(buttons_frame, text="Mostrar todo", command=self.refresh_table)
+        self.btn_import = ttk.Button(buttons_frame, text="Importar", command=self.import_file)
+        self.btn_export = ttk.Button(buttons_frame, text="Exportar", command=self.export_file)
 
         self.btn_add.pack(side="left", padx=3)
         self.btn_edit.pack(side="left", padx=3)
         self.btn_delete.pack(side="left", padx=3)
+        self.btn_bulk.pack(side="left", padx=3)
         self.btn_search.pack(side="left", padx=3)
         self.btn_clear.pack(side="left", padx=3)
+        self.btn_import.pack(side="left", padx=3)
+        self.btn_export.pack(side="left", padx=3)
+
+        self.lbl_status = ttk.Label(top, text="")
+        self.lbl_status.pack(side="right", padx=5)
+
+        # Búsqueda rápida: filtra nombre y departamento mientras se escribe
+        search_frame = ttk.Frame(self)
+        search_frame.pack(side="top", fill="x", padx=5)
+
+        ttk.Label(search_frame, text="Buscar:").pack(side="left")
+        self.var_search = tk.StringVar()
+        self.entry_search = ttk.Entry(search_frame, textvariable=self.var_search)
+        self.entry_search.pack(side="left", fill="x", expand=True, padx=5)
+        self.var_search.trace_add("write", lambda *args: self._on_search_typed())
 
         # Tabla
         columns = ("id", "nombre", "descripcion", "precio", "existencias", "almacen")
-        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=14)
+        self.table = PagedTreeview(
+            self,
+            columns,
+            fetch_page=self._fetch_page,
+            row_values=lambda p: (
+                p.id,
+                p.name,
+                p.description,
+                f"{p.price:.2f}",
+                p.stock,
+                p.warehouse_name or "",
+            ),
+            height=14,
+        )
+        self.tree = self.table.tree
+        self._headings = {}
         for col in columns:
             heading = col.capitalize()
             if col == "almacen":
                 heading = "Almacén"
-            self.tree.heading(col, text=heading)
+            self._headings[col] = heading
+            if col in self.SORT_COLUMNS:
+                self.tree.heading(col, command=lambda c=col: self._sort_by(c))
             self.tree.column(col, width=140, anchor="center")
+        self._update_headings()
 
-
-        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+        self.table.pack(fill="both", expand=True, padx=5, pady=5)
 
         audit_frame = ttk.Frame(self)
         audit_frame.pack(fill="x", padx=5, pady=(0, 5))
@@ -318,6 +840,31 @@ class ProductsView(ttk.Frame):
         self.lbl_ultima_mod.pack(anchor="w")
         self.lbl_ultimo_usuario.pack(anchor="w")
 
+        history_frame = ttk.LabelFrame(self, text="Historial")
+        history_frame.pack(fill="x", padx=5, pady=(0, 5))
+
+        history_columns = (
+            ("fecha", "Fecha", 140),
+            ("usuario", "Usuario", 100),
+            ("operacion", "Operación", 100),
+            ("cambios", "Cambios", 420),
+        )
+        self.history_tree = ttk.Treeview(
+            history_frame, columns=[c[0] for c in history_columns], show="headings", height=5
+        )
+        for col, heading, width in history_columns:
+            self.history_tree.heading(col, text=heading)
+            self.history_tree.column(
+                col, width=width, anchor="w" if col == "cambios" else "center",
+                stretch=col == "cambios",
+            )
+        self.history_tree.pack(side="left", fill="both", expand=True)
+
+        self.btn_more_history = ttk.Button(
+            history_frame, text="Ver más", command=self._load_more_history, state="disabled"
+        )
+        self.btn_more_history.pack(side="right", padx=5)
+
         self.tree.bind("<<TreeviewSelect>>", self._on_select_product)
 
         # Permisos: solo ADMIN y PRODUCTOS pueden modificar
@@ -325,95 +872,104 @@ class ProductsView(ttk.Frame):
             self.btn_add["state"] = "disabled"
             self.btn_edit["state"] = "disabled"
             self.btn_delete["state"] = "disabled"
+            self.btn_bulk["state"] = "disabled"
+            self.btn_import["state"] = "disabled"
 
     # --------- CARGA Y FILTRO ---------
 
     def refresh_table(self):
+        self.var_search.set("")
+        self._cancel_search_job()
         self._load_products()
 
     def _load_products(self, filtros=None):
         if filtros is None:
             filtros = {}
 
-        id_filter = filtros.get("id", "").strip()
-        name_filter = filtros.get("name", "").lower()
-        desc_filter = filtros.get("desc", "").lower()
-        price_min_filter = filtros.get("price_min", "").strip()
-        price_max_filter = filtros.get("price_max", "").strip()
-        stock_min_filter = filtros.get("stock_min", "").strip()
-        stock_max_filter = filtros.get("stock_max", "").strip()
-        warehouse_filter = filtros.get("warehouse", "").lower()
-
-        price_min_value = None
-        price_max_value = None
-        stock_min_value = None
-        stock_max_value = None
-
-        if price_min_filter:
-            try:
-                price_min_value = float(price_min_filter)
-            except ValueError:
-                messagebox.showerror("Error", "El precio mínimo debe ser numérico.")
-                return
+        filters = self._parse_filters(filtros)
+        if filters is None:
+            return
 
-        if price_max_filter:
-            try:
-                price_max_value = float(price_max_filter)
-            except ValueError:
-                messagebox.showerror("Error", "El precio máximo debe ser numérico.")
-                return
+        filters["text"] = self.var_search.get().strip()
+        self.filters = filters
+        self.table.reset()
+        self._show_audit(None)
+
+    def _on_search_typed(self):
+        # la consulta que siga corriendo ya no sirve: se interrumpe de una vez
+        self.worker.cancel("products-page")
+        self._cancel_search_job()
+        self._search_job = self.after(self.SEARCH_DELAY_MS, self._apply_search)
+
+    def _cancel_search_job(self):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+
+    def _apply_search(self):
+        self._search_job = None
+        self.filters = {**self.filters, "text": self.var_search.get().strip()}
+        self.table.reset()
+        self._show_audit(None)
+
+    def _fetch_page(self, callback, **page):
+        self.worker.submit(
+            self.db.search_products,
+            self.filters,
+            callback=callback,
+            key="products-page",
+            order_by=self.order_by,
+            descending=self.descending,
+            **page,
+        )
 
-        if stock_min_filter:
-            try:
-                stock_min_value = int(stock_min_filter)
-            except ValueError:
-                messagebox.showerror("Error", "Las existencias mínimas deben ser numéricas.")
-                return
+    def _sort_by(self, column):
+        """
+        Clic en un encabezado: ordena por esa columna en la base de datos;
+        un segundo clic invierte el orden.
+        """
+        order_by = self.SORT_COLUMNS[column]
+        self.descending = order_by == self.order_by and not self.descending
+        self.order_by = order_by
+        self._update_headings()
+        self.table.set_order(lambda p: product_cursor(p, order_by), self.descending)
+
+    def _update_headings(self):
+        for col, text in self._headings.items():
+            active = self.SORT_COLUMNS.get(col) == self.order_by
+            self.tree.heading(col, text=sort_heading(text, active, self.descending))
+
+    @staticmethod
+    def _parse_filters(filtros):
+        """
+        Valida los filtros del diálogo de búsqueda y convierte los numéricos.
+        Regresa None (después de mostrar el error) si alguno es inválido.
+        """
+        numeric_fields = (
+            ("id", int, "El id debe ser numérico."),
+            ("price_min", float, "El precio mínimo debe ser numérico."),
+            ("price_max", float, "El precio máximo debe ser numérico."),
+            ("stock_min", int, "Las existencias mínimas deben ser numéricas."),
+            ("stock_max", int, "Las existencias máximas deben ser numéricas."),
+        )
 
-        if stock_max_filter:
+        filters = {
+            "name": filtros.get("name", "").strip(),
+            "desc": filtros.get("desc", "").strip(),
+            "warehouse": filtros.get("warehouse", "").strip(),
+        }
+        for key, cast, error in numeric_fields:
+            text = filtros.get(key, "").strip()
+            if not text:
+                filters[key] = None
+                continue
             try:
-                stock_max_value = int(stock_max_filter)
+                filters[key] = cast(text)
             except ValueError:
-                messagebox.showerror("Error", "Las existencias máximas deben ser numéricas.")
-                return
+                messagebox.showerror("Error", error)
+                return None
 
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        for p in self.db.list_products():
-            if id_filter and str(p.id) != id_filter:
-                continue
-            if name_filter and name_filter not in p.name.lower():
-                continue
-            if desc_filter and desc_filter not in p.description.lower():
-                continue
-            if price_min_value is not None and p.price < price_min_value:
-                continue
-            if price_max_value is not None and p.price > price_max_value:
-                continue
-            if stock_min_value is not None and p.stock < stock_min_value:
-                continue
-            if stock_max_value is not None and p.stock > stock_max_value:
-                continue
-            if warehouse_filter and warehouse_filter not in (p.warehouse_name or "").lower():
-                continue
-
-            self.tree.insert(
-                "",
-                "end",
-                values=(
-                    p.id,
-                    p.name,
-                    p.description,
-                    f"{p.price:.2f}",
-                    p.stock,
-                    p.warehouse_name or "",
-                ),
-            )
-
-        self.lbl_creacion.config(text="Creado: -")
-        self.lbl_ultima_mod.config(text="Última modificación: -")
-        self.lbl_ultimo_usuario.config(text="Último usuario en modificar: -")
+        return filters
 
     def open_search_dialog(self):
         dlg = ProductSearchDialog(self)
@@ -421,6 +977,78 @@ class ProductsView(ttk.Frame):
         if dlg.result is not None:
             self._load_products(dlg.result)
 
+    # --------- CAMBIOS EN LA BASE ---------
+
+    def _on_db_change(self, event):
+        if event.table == "almacenes":
+            # solo cambia el nombre de almacén mostrado en las filas
+            self.table.reload_window()
+            return
+        if event.op == "bulk":
+            self.table.refresh()
+            return
+        if event.row_ids:
+            self._on_bulk_change(event)
+            return
+        if event.op == "delete":
+            self.table.remove_row(event.row_id)
+            return
+
+        id_filter = self.filters.get("id")
+        if id_filter is not None and id_filter != event.row_id:
+            return
+        self.worker.submit(
+            self.db.search_products,
+            {**self.filters, "id": event.row_id},
+            callback=lambda rows: self._apply_changed_row(event.row_id, rows),
+        )
+
+    def _on_bulk_change(self, event):
+        """
+        Edición masiva: solo se tocan las filas afectadas que están en la
+        ventana cargada, leídas en una sola consulta.
+        """
+        loaded = set(self.tree.get_children())
+        affected = [i for i in event.row_ids if str(i) in loaded]
+        if event.op == "delete":
+            for product_id in affected:
+                self.table.remove_row(product_id)
+            return
+
+        id_filter = self.filters.get("id")
+        if id_filter is not None:
+            affected = [i for i in event.row_ids if i == id_filter]
+        elif self.order_by != "id":
+            # con otro orden una fila de fuera puede caer dentro de la ventana
+            affected = list(event.row_ids)
+        if not affected:
+            return
+        self.worker.submit(
+            self.db.search_products,
+            {**self.filters, "ids": affected},
+            callback=lambda rows: self._apply_changed_rows(affected, rows),
+        )
+
+    def _apply_changed_rows(self, product_ids, rows):
+        for product in rows:
+            self.table.upsert_row(product)
+        # las que faltan ya no cumplen el filtro actual
+        found = {p.id for p in rows}
+        for product_id in product_ids:
+            if product_id not in found:
+                self.table.remove_row(product_id)
+        if self._get_selected_product_id() in product_ids:
+            self._on_select_product()
+
+    def _apply_changed_row(self, product_id, rows):
+        if rows:
+            self.table.upsert_row(rows[0])
+        else:
+            # ya no cumple el filtro actual
+            self.table.remove_row(product_id)
+        if self._get_selected_product_id() == product_id:
+            self._on_select_product()
+
     # --------- AUDITORÍA ---------
 
     def _get_selected_product_id(self):
@@ -430,30 +1058,126 @@ class ProductsView(ttk.Frame):
         values = self.tree.item(sel[0])["values"]
         return values[0]
 
+    def _get_selected_product_ids(self):
+        return [int(iid) for iid in self.tree.selection()]
+
     def _on_select_product(self, event=None):
         product_id = self._get_selected_product_id()
         if product_id is None:
+            self._show_audit(None)
             return
 
-        row = self.db.get_product_audit(product_id)
-        if not row:
+        self.worker.submit(
+            self.db.get_product,
+            product_id,
+            callback=self._show_audit,
+            key="product-audit",
+        )
+        self.worker.submit(
+            self._read_history,
+            product_id,
+            callback=lambda page: self._show_history(product_id, *page),
+            key="product-history",
+        )
+
+    def _show_audit(self, product):
+        if not product:
             self.lbl_creacion.config(text="Creado: -")
             self.lbl_ultima_mod.config(text="Última modificación: -")
             self.lbl_ultimo_usuario.config(text="Último usuario en modificar: -")
+            self.worker.cancel("product-history")
+            self._show_history(None, [], {})
             return
 
-        creado = row["fecha_hora_creacion"] or "-"
-        ultima = row["fecha_hora_ultima_modificacion"] or "-"
-        usuario = row["ultimo_usuario_en_modificar"] or "-"
+        creado = product.created_at or "-"
+        ultima = product.last_modified or "-"
+        usuario = product.last_modified_by or "-"
 
         self.lbl_creacion.config(text=f"Creado: {creado}")
         self.lbl_ultima_mod.config(text=f"Última modificación: {ultima}")
         self.lbl_ultimo_usuario.config(text=f"Último usuario en modificar: {usuario}")
 
+    # --------- HISTORIAL ---------
+
+    def _read_history(self, product_id, before=None):
+        """
+        Corre en el hilo de la base: una página del historial y los nombres
+        de almacén con que se muestra.
+        """
+        entries = self.db.get_product_history(product_id, self.HISTORY_PAGE, before=before)
+        return entries, self.db.warehouse_catalog().id_to_name
+
+    def _show_history(self, product_id, entries, warehouse_names, append=False):
+        if not append:
+            children = self.history_tree.get_children()
+            if children:
+                self.history_tree.delete(*children)
+            self._history_last_id = None
+        self._history_product = product_id
+
+        for entry in entries:
+            self.history_tree.insert(
+                "",
+                "end",
+                values=(
+                    entry.timestamp,
+                    entry.username or "-",
+                    self.HISTORY_OPS.get(entry.op, entry.op),
+                    self._history_changes(entry, warehouse_names),
+                ),
+            )
+        if entries:
+            self._history_last_id = entries[-1].id
+        more = len(entries) == self.HISTORY_PAGE
+        self.btn_more_history["state"] = "normal" if more else "disabled"
+
+    def _load_more_history(self):
+        product_id = self._history_product
+        if product_id is None or self._history_last_id is None:
+            return
+        self.worker.submit(
+            self._read_history,
+            product_id,
+            before=self._history_last_id,
+            callback=lambda page: self._show_history(product_id, *page, append=True),
+            key="product-history",
+        )
+
+    def _history_changes(self, entry, warehouse_names: dict) -> str:
+        """
+        Resumen de una entrada del historial: los campos que cambiaron
+        (antes -> después), o la fila completa en altas y bajas.
+        """
+        def show(key, value):
+            if key == "almacen":
+                return warehouse_names.get(value, value)
+            return value
+
+        if entry.op == "UPDATE":
+            changes = [
+                f"{label}: {show(key, entry.before.get(key))} → {show(key, entry.after.get(key))}"
+                for key, label in self.HISTORY_FIELDS
+                if entry.before.get(key) != entry.after.get(key)
+            ]
+            return "; ".join(changes)
+
+        row = entry.after if entry.op == "INSERT" else entry.before
+        return "; ".join(
+            f"{label}: {show(key, row.get(key))}" for key, label in self.HISTORY_FIELDS
+        )
+
     # --------- CRUD ---------
 
     def add_product(self):
-        dialog = ProductDialog(self, self.db, "Agregar producto")
+        # el catálogo se lee en el hilo de la base, como las demás consultas
+        self.worker.submit(
+            self.db.warehouse_catalog,
+            callback=self._open_add_dialog,
+            key="product-edit",
+        )
+
+    def _open_add_dialog(self, catalog):
+        dialog = ProductDialog(self, catalog, "Agregar producto")
         self.wait_window(dialog)
         if dialog.result:
             name, desc, price, stock, warehouse_id = dialog.result
@@ -463,8 +1187,10 @@ class ProductsView(ttk.Frame):
             except ValueError:
                 messagebox.showerror("Error", "Precio o existencias inválidas.")
                 return
-            self.db.add_product(name, desc, price, stock, warehouse_id, self.user.username)
-            self.refresh_table()
+            self.worker.submit(
+                self.db.add_product,
+                name, desc, price, stock, warehouse_id, self.user.username,
+            )
 
     def edit_product(self):
         product_id = self._get_selected_product_id()
@@ -472,18 +1198,20 @@ class ProductsView(ttk.Frame):
             messagebox.showwarning("Advertencia", "Seleccione un producto.")
             return
 
-        product = None
-        for p in self.db.list_products():
-            if p.id == product_id:
-                product = p
-                break
+        self.worker.submit(
+            lambda: (self.db.get_product(product_id), self.db.warehouse_catalog()),
+            callback=lambda result: self._open_edit_dialog(product_id, *result),
+            key="product-edit",
+        )
+
+    def _open_edit_dialog(self, product_id, product, catalog):
         if not product:
             messagebox.showerror("Error", "Producto no encontrado.")
             return
 
         dialog = ProductDialog(
             self,
-            self.db,
+            catalog,
             "Modificar producto",
             initial_name=product.name,
             initial_desc=product.description,
@@ -500,17 +1228,150 @@ class ProductsView(ttk.Frame):
             except ValueError:
                 messagebox.showerror("Error", "Precio o existencias inválidas.")
                 return
-            self.db.update_product(product_id, name, desc, price, stock, warehouse_id, self.user.username)
-            self.refresh_table()
+            self.worker.submit(
+                self.db.update_product,
+                product_id, name, desc, price, stock, warehouse_id, self.user.username,
+            )
 
     def delete_product(self):
-        product_id = self._get_selected_product_id()
-        if product_id is None:
+        product_ids = self._get_selected_product_ids()
+        if not product_ids:
             messagebox.showwarning("Advertencia", "Seleccione un producto.")
             return
+        if len(product_ids) > 1:
+            question = f"¿Seguro que desea eliminar los {len(product_ids)} productos seleccionados?"
+            if messagebox.askyesno("Confirmar", question):
+                self.worker.submit(
+                    self.db.bulk_delete_products,
+                    product_ids,
+                    self.user.username,
+                    callback=lambda count: self._on_bulk_done(f"Se eliminaron {count} productos"),
+                )
+            return
         if messagebox.askyesno("Confirmar", "¿Seguro que desea eliminar este producto?"):
-            self.db.delete_product(product_id)
-            self.refresh_table()
+            self.worker.submit(
+                self.db.delete_product,
+                product_ids[0],
+                self.user.username,
+            )
+
+    # --------- EDICIÓN MASIVA ---------
+
+    def bulk_edit(self):
+        product_ids = self._get_selected_product_ids()
+        self.worker.submit(
+            self.db.warehouse_catalog,
+            callback=lambda catalog: self._open_bulk_dialog(product_ids, catalog),
+            key="product-edit",
+        )
+
+    def _open_bulk_dialog(self, product_ids, catalog):
+        dialog = BulkEditDialog(self, catalog, len(product_ids))
+        self.wait_window(dialog)
+        if not dialog.result:
+            return
+        operation, value, whole_filter = dialog.result
+        if not whole_filter and not product_ids:
+            messagebox.showwarning("Advertencia", "Seleccione uno o más productos.")
+            return
+
+        filters = dict(self.filters) if whole_filter else None
+        username = self.user.username
+        bulk = {
+            "price": self.db.bulk_reprice,
+            "warehouse": self.db.bulk_move_warehouse,
+            "stock": self.db.bulk_adjust_stock,
+        }[operation]
+
+        def run():
+            ids = product_ids if filters is None else self.db.list_product_ids(filters)
+            return bulk(ids, value, username)
+
+        self.btn_bulk["state"] = "disabled"
+        self.lbl_status.config(text="Aplicando edición masiva...")
+        self.worker.submit(
+            run,
+            callback=lambda count: self._on_bulk_done(f"Se modificaron {count} productos"),
+            errback=self._on_bulk_failed,
+        )
+
+    def _on_bulk_done(self, message):
+        self.btn_bulk["state"] = "normal"
+        self.lbl_status.config(text=message)
+
+    def _on_bulk_failed(self, exc):
+        self.btn_bulk["state"] = "normal"
+        self.lbl_status.config(text="")
+        messagebox.showerror("Error", f"No se aplicó la edición masiva:\n{exc}")
+
+    # --------- IMPORTACIÓN ---------
+
+    def import_file(self):
+        path = ask_import_file(self, "Importar productos")
+        if not path:
+            return
+
+        self.btn_import["state"] = "disabled"
+        self.lbl_status.config(text="Importando...")
+        self.worker.submit(
+            importer.import_products,
+            self.db,
+            path,
+            self.user.username,
+            progress=lambda result: self.worker.notify(self._on_import_progress, result.imported),
+            callback=self._on_import_done,
+            errback=self._on_import_failed,
+        )
+
+    def _on_import_progress(self, imported):
+        self.lbl_status.config(text=f"Importando... {imported} filas")
+
+    def _on_import_done(self, result):
+        self.btn_import["state"] = "normal"
+        self.lbl_status.config(text="")
+        show_import_result(result)
+
+    def _on_import_failed(self, exc):
+        self.btn_import["state"] = "normal"
+        self.lbl_status.config(text="")
+        messagebox.showerror("Error", f"No se pudo importar el archivo:\n{exc}")
+
+    # --------- EXPORTACIÓN ---------
+
+    def export_file(self):
+        path = filedialog.asksaveasfilename(
+            parent=self,
+            title="Exportar productos",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Excel", "*.xlsx"), ("JSON Lines", "*.jsonl")],
+        )
+        if not path:
+            return
+
+        self.btn_export["state"] = "disabled"
+        self.lbl_status.config(text="Exportando...")
+        self.worker.submit(
+            exporter.export_products,
+            self.db,
+            dict(self.filters),
+            path,
+            progress=lambda count: self.worker.notify(self._on_export_progress, count),
+            callback=lambda count: self._on_export_done(path, count),
+            errback=self._on_export_failed,
+        )
+
+    def _on_export_progress(self, count):
+        self.lbl_status.config(text=f"Exportando... {count} filas")
+
+    def _on_export_done(self, path, count):
+        self.btn_export["state"] = "normal"
+        self.lbl_status.config(text="")
+        messagebox.showinfo("Exportación", f"Se exportaron {count} productos a:\n{path}")
+
+    def _on_export_failed(self, exc):
+        self.btn_export["state"] = "normal"
+        self.lbl_status.config(text="")
+        messagebox.showerror("Error", f"No se pudo exportar:\n{exc}")
 
 
 # ==============================
@@ -518,14 +1379,29 @@ class ProductsView(ttk.Frame):
 # ==============================
 
 class WarehousesView(ttk.Frame):
-    def __init__(self, parent, db: Database, user: User):
+    # columna de la tabla -> orden de Database.search_warehouses
+    SORT_COLUMNS = {
+        "id": "id",
+        "nombre": "name",
+    }
+
+    def __init__(self, parent, db: Database, user: User, worker: DatabaseWorker):
         super().__init__(parent)
         self.db = db
         self.user = user
+        self.worker = worker
+        self.filters = {}
+        self.order_by = "id"
+        self.descending = False
 
         self._build_widgets()
         self.refresh_table()
 
+        self._unsubscribe = self.db.subscribe(
+            lambda event: self.worker.notify(self._on_db_change, event)
+        )
+        self.bind("<Destroy>", lambda e: self._unsubscribe())
+
     def _build_widgets(self):
         top = ttk.Frame(self)
         top.pack(side="top", fill="x", pady=5)
@@ -538,20 +1414,35 @@ class WarehousesView(ttk.Frame):
         self.btn_delete = ttk.Button(buttons_frame, text="Eliminar", command=self.delete_warehouse)
         self.btn_search = ttk.Button(buttons_frame, text="Buscar", command=self.open_search_dialog)
         self.btn_clear = ttk.Button(buttons_frame, text="Mostrar todo", command=self.refresh_table)
+        self.btn_import = ttk.Button(buttons_frame, text="Importar", command=self.import_file)
 
         self.btn_add.pack(side="left", padx=3)
         self.btn_edit.pack(side="left", padx=3)
         self.btn_delete.pack(side="left", padx=3)
         self.btn_search.pack(side="left", padx=3)
         self.btn_clear.pack(side="left", padx=3)
+        self.btn_import.pack(side="left", padx=3)
+
+        self.lbl_status = ttk.Label(top, text="")
+        self.lbl_status.pack(side="right", padx=5)
 
         columns = ("id", "nombre")
-        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=14)
+        self.table = PagedTreeview(
+            self,
+            columns,
+            fetch_page=self._fetch_page,
+            row_values=lambda w: (w.id, w.name),
+            height=14,
+        )
+        self.tree = self.table.tree
+        self._headings = {}
         for col in columns:
-            self.tree.heading(col, text=col.capitalize())
+            self._headings[col] = col.capitalize()
+            self.tree.heading(col, command=lambda c=col: self._sort_by(c))
             self.tree.column(col, width=200, anchor="center")
+        self._update_headings()
 
-        self.tree.pack(fill="both", expand=True, padx=5, pady=5)
+        self.table.pack(fill="both", expand=True, padx=5, pady=5)
 
         audit_frame = ttk.Frame(self)
         audit_frame.pack(fill="x", padx=5, pady=(0, 5))
@@ -571,6 +1462,7 @@ class WarehousesView(ttk.Frame):
             self.btn_add["state"] = "disabled"
             self.btn_edit["state"] = "disabled"
             self.btn_delete["state"] = "disabled"
+            self.btn_import["state"] = "disabled"
 
     # --------- CARGA Y FILTRO ---------
 
@@ -582,28 +1474,78 @@ class WarehousesView(ttk.Frame):
             filtros = {}
 
         id_filter = filtros.get("id", "").strip()
-        name_filter = filtros.get("name", "").lower()
-
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        if id_filter and not id_filter.isdigit():
+            messagebox.showerror("Error", "El id debe ser numérico.")
+            return
 
-        for w in self.db.list_warehouses():
-            if id_filter and str(w.id) != id_filter:
-                continue
-            if name_filter and name_filter not in w.name.lower():
-                continue
-            self.tree.insert("", "end", values=(w.id, w.name))
+        self.filters = {
+            "id": int(id_filter) if id_filter else None,
+            "name": filtros.get("name", "").strip(),
+        }
+        self.table.reset()
 
         self.lbl_creacion.config(text="Creado: -")
         self.lbl_ultima_mod.config(text="Última modificación: -")
         self.lbl_ultimo_usuario.config(text="Último usuario en modificar: -")
 
+    def _fetch_page(self, callback, **page):
+        self.worker.submit(
+            self.db.search_warehouses,
+            self.filters,
+            callback=callback,
+            key="warehouses-page",
+            order_by=self.order_by,
+            descending=self.descending,
+            **page,
+        )
+
+    def _sort_by(self, column):
+        order_by = self.SORT_COLUMNS[column]
+        self.descending = order_by == self.order_by and not self.descending
+        self.order_by = order_by
+        self._update_headings()
+        self.table.set_order(lambda w: warehouse_cursor(w, order_by), self.descending)
+
+    def _update_headings(self):
+        for col, text in self._headings.items():
+            active = self.SORT_COLUMNS.get(col) == self.order_by
+            self.tree.heading(col, text=sort_heading(text, active, self.descending))
+
     def open_search_dialog(self):
         dlg = WarehouseSearchDialog(self)
         self.wait_window(dlg)
         if dlg.result is not None:
             self._load_warehouses(dlg.result)
 
+    # --------- CAMBIOS EN LA BASE ---------
+
+    def _on_db_change(self, event):
+        if event.table != "almacenes":
+            return
+        if event.op == "bulk":
+            self.table.refresh()
+            return
+        if event.op == "delete":
+            self.table.remove_row(event.row_id)
+            return
+
+        id_filter = self.filters.get("id")
+        if id_filter is not None and id_filter != event.row_id:
+            return
+        self.worker.submit(
+            self.db.search_warehouses,
+            {**self.filters, "id": event.row_id},
+            callback=lambda rows: self._apply_changed_row(event.row_id, rows),
+        )
+
+    def _apply_changed_row(self, warehouse_id, rows):
+        if rows:
+            self.table.upsert_row(rows[0])
+        else:
+            self.table.remove_row(warehouse_id)
+        if self._get_selected_id() == warehouse_id:
+            self._on_select_warehouse()
+
     # --------- AUDITORÍA ---------
 
     def _get_selected_id(self):
@@ -618,7 +1560,14 @@ class WarehousesView(ttk.Frame):
         if warehouse_id is None:
             return
 
-        row = self.db.get_warehouse_audit(warehouse_id)
+        self.worker.submit(
+            self.db.get_warehouse_audit,
+            warehouse_id,
+            callback=self._show_audit,
+            key="warehouse-audit",
+        )
+
+    def _show_audit(self, row):
         if not row:
             self.lbl_creacion.config(text="Creado: -")
             self.lbl_ultima_mod.config(text="Última modificación: -")
@@ -644,8 +1593,10 @@ class WarehousesView(ttk.Frame):
 
         warehouse_id, name = dialog.result
 
-        self.db.add_warehouse(warehouse_id, name, self.user.username)
-        self.refresh_table()
+        self.worker.submit(
+            self.db.add_warehouse,
+            warehouse_id, name, self.user.username,
+        )
 
     def edit_warehouse(self):
         warehouse_id = self._get_selected_id()
@@ -671,8 +1622,10 @@ class WarehousesView(ttk.Frame):
             return
 
         _ignored_id, new_name = dialog.result
-        self.db.update_warehouse(current_id, new_name, self.user.username)
-        self.refresh_table()
+        self.worker.submit(
+            self.db.update_warehouse,
+            current_id, new_name, self.user.username,
+        )
 
     def delete_warehouse(self):
         warehouse_id = self._get_selected_id()
@@ -680,8 +1633,43 @@ class WarehousesView(ttk.Frame):
             messagebox.showwarning("Advertencia", "Seleccione un almacén.")
             return
         if messagebox.askyesno("Confirmar", "¿Seguro que desea eliminar este almacén?"):
-            self.db.delete_warehouse(warehouse_id)
-            self.refresh_table()
+            self.worker.submit(
+                self.db.delete_warehouse,
+                warehouse_id,
+                self.user.username,
+            )
+
+    # --------- IMPORTACIÓN ---------
+
+    def import_file(self):
+        path = ask_import_file(self, "Importar almacenes")
+        if not path:
+            return
+
+        self.btn_import["state"] = "disabled"
+        self.lbl_status.config(text="Importando...")
+        self.worker.submit(
+            importer.import_warehouses,
+            self.db,
+            path,
+            self.user.username,
+            progress=lambda result: self.worker.notify(self._on_import_progress, result.imported),
+            callback=self._on_import_done,
+            errback=self._on_import_failed,
+        )
+
+    def _on_import_progress(self, imported):
+        self.lbl_status.config(text=f"Importando... {imported} filas")
+
+    def _on_import_done(self, result):
+        self.btn_import["state"] = "normal"
+        self.lbl_status.config(text="")
+        show_import_result(result)
+
+    def _on_import_failed(self, exc):
+        self.btn_import["state"] = "normal"
+        self.lbl_status.config(text="")
+        messagebox.showerror("Error", f"No se pudo importar el archivo:\n{exc}")
 
 # ==============================
 #  DIÁLOGOS
@@ -814,11 +1802,112 @@ class WarehouseSearchDialog(tk.Toplevel):
         }
         self.destroy()
 
+class BulkEditDialog(tk.Toplevel):
+    """
+    Elige la edición masiva: precio por porcentaje, almacén principal o
+    ajuste de existencias, sobre la selección o sobre todo el filtro actual.
+    result = (operación, valor, todo_el_filtro).
+    """
+
+    OPERATIONS = (
+        ("price", "Cambiar precio (%)"),
+        ("warehouse", "Mover a almacén"),
+        ("stock", "Ajustar existencias (+/-)"),
+    )
+
+    def __init__(self, parent, catalog: WarehouseCatalog, selected_count: int):
+        super().__init__(parent)
+        self.title("Edición masiva")
+        self.resizable(False, False)
+        self.result = None
+
+        self.warehouse_name_to_id = catalog.name_to_id
+
+        frm = ttk.Frame(self, padding=10)
+        frm.pack(fill="both", expand=True)
+
+        self.var_operation = tk.StringVar(value="price")
+        for row, (value, text) in enumerate(self.OPERATIONS):
+            ttk.Radiobutton(
+                frm, text=text, value=value, variable=self.var_operation,
+                command=self._on_operation,
+            ).grid(row=row, column=0, columnspan=2, sticky="w", pady=2)
+
+        ttk.Label(frm, text="Valor:").grid(row=3, column=0, sticky="e", pady=5)
+        self.var_value = tk.StringVar()
+        self.entry_value = ttk.Entry(frm, textvariable=self.var_value)
+        self.entry_value.grid(row=3, column=1, sticky="we", pady=5)
+
+        ttk.Label(frm, text="Almacén:").grid(row=4, column=0, sticky="e", pady=5)
+        self.var_warehouse_name = tk.StringVar()
+        self.combo_warehouse = ttk.Combobox(
+            frm,
+            textvariable=self.var_warehouse_name,
+            values=[w.name for w in catalog.warehouses],
+            state="disabled",
+        )
+        self.combo_warehouse.grid(row=4, column=1, sticky="we", pady=5)
+
+        self.var_whole_filter = tk.BooleanVar(value=selected_count == 0)
+        ttk.Checkbutton(
+            frm,
+            text=f"Aplicar a todo el filtro actual (seleccionados: {selected_count})",
+            variable=self.var_whole_filter,
+        ).grid(row=5, column=0, columnspan=2, sticky="w", pady=5)
+
+        frm.columnconfigure(1, weight=1)
+
+        btns = ttk.Frame(frm)
+        btns.grid(row=6, column=0, columnspan=2, pady=10)
+
+        ttk.Button(btns, text="Aplicar", command=self._on_ok).pack(side="left", padx=5)
+        ttk.Button(btns, text="Cancelar", command=self.destroy).pack(side="left", padx=5)
+
+        self.transient(parent)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+        self._center_window()
+
+    def _on_operation(self):
+        warehouse = self.var_operation.get() == "warehouse"
+        self.entry_value["state"] = "disabled" if warehouse else "normal"
+        self.combo_warehouse["state"] = "readonly" if warehouse else "disabled"
+
+    def _on_ok(self):
+        operation = self.var_operation.get()
+        if operation == "warehouse":
+            name = self.var_warehouse_name.get().strip()
+            if name not in self.warehouse_name_to_id:
+                messagebox.showerror("Error", "Almacén inválido.")
+                return
+            value = self.warehouse_name_to_id[name]
+        else:
+            cast = float if operation == "price" else int
+            try:
+                value = cast(self.var_value.get().strip())
+            except ValueError:
+                messagebox.showerror("Error", "El valor debe ser numérico.")
+                return
+
+        self.result = (operation, value, self.var_whole_filter.get())
+        self.destroy()
+
+    def _center_window(self):
+        self.update_idletasks()
+        w = self.winfo_width()
+        h = self.winfo_height()
+        sw = self.winfo_screenwidth()
+        sh = self.winfo_screenheight()
+        x = (sw // 2) - (w // 2)
+        y = (sh // 2) - (h // 2)
+        self.geometry(f"{w}x{h}+{x}+{y}")
+
 class ProductDialog(tk.Toplevel):
     def __init__(
             self,
             parent,
-            db: Database,
+            catalog: WarehouseCatalog,
             title: str,
             initial_name: str = "",
             initial_desc: str = "",
@@ -828,14 +1917,14 @@ class ProductDialog(tk.Toplevel):
     ):
         super().__init__(parent)
         self.result = None
-        self.db = db
         self.title(title)
         self.geometry("400x260")
         self.resizable(False, False)
         self._center_window()
 
-        self.warehouses = self.db.list_warehouses()
-        self.warehouse_name_to_id = {w.name: w.id for w in self.warehouses}
+        # el catálogo lo lee quien abre el diálogo, en el hilo de la base
+        self.warehouses = catalog.warehouses
+        self.warehouse_name_to_id = catalog.name_to_id
 
         frm = ttk.Frame(self, padding=10)
         frm.pack(fill="both", expand=True)
@@ -987,4 +2076,100 @@ class WarehouseDialog(tk.Toplevel):
             return
 
         self.result = (warehouse_id, name)
-        self.destroy()
\ No newline at end of file
+        self.destroy()
+
+
+class DiagnosticsDialog(tk.Toplevel):
+    """
+    Estadísticas de la base mientras la aplicación corre: por operación
+    (Database.get_query_stats) y del pool de lectura y las cachés. Solo lee
+    contadores en memoria, así que se consulta directo desde Tk.
+    """
+
+    REFRESH_MS = 2000
+    COLUMNS = (
+        ("operation", "Operación", 170, "{}"),
+        ("calls", "Llamadas", 70, "{:,}"),
+        ("p50_ms", "p50 ms", 70, "{:.2f}"),
+        ("p95_ms", "p95 ms", 70, "{:.2f}"),
+        ("p99_ms", "p99 ms", 70, "{:.2f}"),
+        ("total_ms", "Total ms", 80, "{:,.0f}"),
+        ("rows", "Filas", 80, "{:,}"),
+        ("commits", "Commits", 70, "{:,}"),
+        ("errors", "Errores", 60, "{:,}"),
+    )
+
+    def __init__(self, parent, db: Database):
+        super().__init__(parent)
+        self.db = db
+        self.title("Diagnóstico de la base de datos")
+        self._refresh_job = None
+
+        frm = ttk.Frame(self, padding=10)
+        frm.pack(fill="both", expand=True)
+
+        if db.query_stats is None:
+            text = (
+                "La instrumentación está apagada: inicie con INVENTARIO_DIAGNOSTICO=1 "
+                "para ver las estadísticas por operación."
+            )
+        else:
+            text = (
+                f"Consultas de {db.config.slow_query_ms:g} ms o más se anotan en "
+                f"{db.config.slow_query_log or '(sin bitácora)'}."
+            )
+        ttk.Label(frm, text=text).pack(anchor="w")
+
+        self.tree = ttk.Treeview(
+            frm, columns=[c[0] for c in self.COLUMNS], show="headings", height=14
+        )
+        for col, heading, width, _ in self.COLUMNS:
+            self.tree.heading(col, text=heading)
+            self.tree.column(col, width=width, anchor="w" if col == "operation" else "e")
+        self.tree.pack(fill="both", expand=True, pady=5)
+
+        self.lbl_caches = ttk.Label(frm, text="", justify="left")
+        self.lbl_caches.pack(anchor="w")
+
+        btns = ttk.Frame(frm)
+        btns.pack(pady=(10, 0))
+        ttk.Button(btns, text="Reiniciar", command=self._on_reset).pack(side="left", padx=5)
+        ttk.Button(btns, text="Cerrar", command=self.destroy).pack(side="left", padx=5)
+
+        self.transient(parent)
+        self.bind("<Destroy>", self._on_destroy)
+        self._refresh()
+
+    def _refresh(self):
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        for stats in self.db.get_query_stats():
+            self.tree.insert(
+                "", "end", values=[fmt.format(stats[col]) for col, _, _, fmt in self.COLUMNS]
+            )
+
+        def show(stats):
+            return ", ".join(f"{key}: {value}" for key, value in stats.items()) or "-"
+
+        slow = self.db.query_stats.slow_queries if self.db.query_stats is not None else 0
+        self.lbl_caches.config(
+            text=(
+                f"Consultas lentas: {slow}\n"
+                f"Pool de lectura: {show(self.db.pool_stats())}\n"
+                f"Caché de productos: {show(self.db.product_cache_stats())}\n"
+                f"Catálogo de almacenes: {show(self.db.warehouse_cache_stats())}"
+            )
+        )
+        self._refresh_job = self.after(self.REFRESH_MS, self._refresh)
+
+    def _on_reset(self):
+        self.db.reset_query_stats()
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+        self._refresh()
+
+    def _on_destroy(self, event):
+        if event.widget is self and self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None